@@ -48,13 +48,16 @@ class DexScreenerAction:
             logger.error(f"API request failed: {str(e)}")
             raise
 
-    def makeBatchRequest(self, tokenAddresses: List[str], chainId: str = "solana") -> Optional[List[Dict[str, Any]]]:
+    def makeBatchRequest(self, tokenAddresses: List[str], chainId: str = "solana",
+                         raiseTransportErrors: bool = False) -> Optional[List[Dict[str, Any]]]:
         """
         Make batch HTTP request to DexScreener API for multiple tokens
         
         Args:
             tokenAddresses: List of token addresses to query
             chainId: Chain ID (default: solana)
+            raiseTransportErrors: Re-raise timeouts and connection errors (so callers can retry them)
+                instead of returning None
             
         Returns:
             API response as list of dictionaries or None if request failed
@@ -87,6 +90,13 @@ class DexScreenerAction:
             
         except requests.exceptions.Timeout:
             logger.error("Batch API request timed out")
+            if raiseTransportErrors:
+                raise
+            return None
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Batch API request failed: {str(e)}")
+            if raiseTransportErrors:
+                raise
             return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Batch API request failed: {str(e)}")
@@ -173,13 +183,16 @@ class DexScreenerAction:
             logger.error(f"Failed to get token price: {str(e)}")
             return None
 
-    def getBatchTokenPrices(self, tokenAddresses: List[str], chainId: str = "solana") -> Dict[str, Optional[TokenPrice]]:
+    def getBatchTokenPrices(self, tokenAddresses: List[str], chainId: str = "solana",
+                            raiseTransportErrors: bool = False) -> Dict[str, Optional[TokenPrice]]:
         """
         Get token prices for multiple tokens in batches
         
         Args:
             tokenAddresses: List of token addresses to query
             chainId: Chain ID (default: solana)
+            raiseTransportErrors: Re-raise timeouts and connection errors instead of marking
+                the batch's tokens as None
             
         Returns:
             Dictionary mapping token addresses to TokenPrice objects
@@ -200,7 +213,7 @@ class DexScreenerAction:
             logger.info(f"Processing batch {i//30 + 1} with {batchSize} tokens")
             
             try:
-                response = self.makeBatchRequest(batch, chainId)
+                response = self.makeBatchRequest(batch, chainId, raiseTransportErrors)
                 
                 if not response:
                     logger.error(f"Batch request failed for {batchSize} tokens")
@@ -250,6 +263,8 @@ class DexScreenerAction:
                 logger.info(f"Successfully processed batch with {len(processedTokens)} tokens")
                 
             except Exception as e:
+                if raiseTransportErrors and isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                    raise
                 logger.error(f"Failed to process batch token prices: {str(e)}")
                 # Mark all tokens in this batch as None on error
                 for tokenAddress in batch:
@@ -131,6 +131,14 @@ class PumpFunAction:
         Returns:
             List[PumpFunToken]: List of tokens that were successfully persisted
         """
+        try:
+            self.db.pumpfun.insertTokenDataBatch(pumpFunTokens)
+            logger.info(f"Successfully persisted {len(pumpFunTokens)} pump fun tokens")
+            return list(pumpFunTokens)
+        except Exception as batch_error:
+            # Fall back to per-token writes so one bad token doesn't drop the whole batch
+            logger.error(f"Batch persist failed, retrying token by token: {str(batch_error)}")
+
         successfulTokens = []
         try:
             for token in pumpFunTokens:
@@ -21,6 +21,8 @@ def getLastNDayInvestmentReport(wallet_address):
         days: Number of days to look back (default: 30)
         sort_by: Field to sort tokens by (default: totalPnl)
         sort_order: Sort order (asc or desc)
+        limit: Maximum number of tokens to return (default: all)
+        offset: Number of sorted tokens to skip (default: 0)
         
     Returns:
         JSON response with investment report data
@@ -38,6 +40,8 @@ def getLastNDayInvestmentReport(wallet_address):
         days = request.args.get('days', 30, type=int)
         sortBy = request.args.get('sort_by', 'totalPnl')
         sortOrder = request.args.get('sort_order', 'desc')
+        limit = request.args.get('limit', None, type=int)
+        offset = request.args.get('offset', 0, type=int)
         
         # Validate days parameter
         if days <= 0:
@@ -53,7 +57,9 @@ def getLastNDayInvestmentReport(wallet_address):
                 wallet_address=wallet_address,
                 days=days,
                 sort_by=sortBy,
-                sort_order=sortOrder
+                sort_order=sortOrder,
+                limit=limit,
+                offset=offset
             )
             
             # Return the data
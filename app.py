@@ -193,7 +193,7 @@ class PortfolioApp:
 
             try:
                 logger.info("Closing database connections...")
-                SQLitePortfolioDB().close()
+                SQLitePortfolioDB().close_all()
                 logger.info("✅ Database connections closed")
             except Exception as e:
                 logger.error(f"Error closing database: {e}")
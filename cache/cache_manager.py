@@ -24,6 +24,7 @@ import json
 import logging
 from typing import Any, Dict, List, Optional, Union, Callable
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
 import os
@@ -36,7 +37,8 @@ class SimpleTTLCache:
         self.maxsize = maxsize
         self.ttl = ttl
         self._cache = {}
-        self._timestamps = {}
+        # Kept in write order, so the oldest entries are always at the front
+        self._timestamps = OrderedDict()
         self._lock = threading.RLock()
     
     def _is_expired(self, key: str) -> bool:
@@ -46,23 +48,20 @@ class SimpleTTLCache:
         return time.time() - self._timestamps[key] > self.ttl
     
     def _cleanup_expired(self):
-        """Remove expired entries."""
-        current_time = time.time()
-        expired_keys = [
-            key for key, timestamp in self._timestamps.items()
-            if current_time - timestamp > self.ttl
-        ]
-        for key in expired_keys:
-            self._cache.pop(key, None)
-            self._timestamps.pop(key, None)
+        """Remove expired entries (only the expired prefix is visited)."""
+        cutoff = time.time() - self.ttl
+        while self._timestamps:
+            oldest_key, timestamp = next(iter(self._timestamps.items()))
+            if timestamp >= cutoff:
+                break
+            self._timestamps.popitem(last=False)
+            self._cache.pop(oldest_key, None)
     
     def _enforce_size_limit(self):
         """Remove oldest entries if cache exceeds size limit."""
         while len(self._cache) > self.maxsize:
-            # Remove oldest entry
-            oldest_key = min(self._timestamps.keys(), key=self._timestamps.get)
+            oldest_key, _ = self._timestamps.popitem(last=False)
             self._cache.pop(oldest_key, None)
-            self._timestamps.pop(oldest_key, None)
     
     def get(self, key: str) -> Any:
         """Get value from cache."""
@@ -77,6 +76,7 @@ class SimpleTTLCache:
             self._cleanup_expired()
             self._cache[key] = value
             self._timestamps[key] = time.time()
+            self._timestamps.move_to_end(key)
             self._enforce_size_limit()
     
     def __getitem__(self, key: str) -> Any:
@@ -132,6 +132,9 @@ class CacheConfig:
     enable_compression: bool = False
     max_key_length: int = 250
     
+    # Longest a caller waits on another caller's in-flight fetch before doing it itself
+    inflight_wait_timeout: float = 30.0
+    
     @classmethod
     def from_env(cls) -> 'CacheConfig':
         """Load configuration from environment variables."""
@@ -141,7 +144,8 @@ class CacheConfig:
             report_cache_size=int(os.getenv('CACHE_REPORT_SIZE', '10000')),
             report_cache_ttl=int(os.getenv('CACHE_REPORT_TTL', '36000')),
             enable_metrics=os.getenv('CACHE_ENABLE_METRICS', 'true').lower() == 'true',
-            enable_compression=os.getenv('CACHE_ENABLE_COMPRESSION', 'false').lower() == 'true'
+            enable_compression=os.getenv('CACHE_ENABLE_COMPRESSION', 'false').lower() == 'true',
+            inflight_wait_timeout=float(os.getenv('CACHE_INFLIGHT_WAIT_TIMEOUT', '30'))
         )
 
 
@@ -179,6 +183,14 @@ class CacheMetrics:
         self.last_reset = datetime.now()
 
 
+class _InFlight:
+    """A fetch in progress; callers needing the same data wait on it instead of repeating it."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
 class CacheManager:
     """
     Production-ready cache manager with thread-safety, metrics, and monitoring.
@@ -224,6 +236,10 @@ class CacheManager:
         # Thread safety
         self._cache_lock = threading.RLock()
         
+        # Fetches in progress, so concurrent callers share them instead of repeating them
+        self._token_flights: Dict[str, _InFlight] = {}
+        self._report_flights: Dict[str, _InFlight] = {}
+        
         # Metrics
         self._token_metrics = CacheMetrics()
         self._report_metrics = CacheMetrics()
@@ -324,6 +340,11 @@ class CacheManager:
         """
         Get token prices with intelligent caching.
         
+        Uncached tokens are fetched outside the cache lock. Tokens another caller is
+        already fetching are not requested again; this call waits (up to
+        inflight_wait_timeout) for that fetch and shares its result. If that fetch
+        failed or did not finish in time, its tokens are fetched here instead.
+        
         Args:
             token_addresses: List of token addresses to fetch prices for
             fetch_func: Function to call for fetching uncached prices
@@ -337,6 +358,7 @@ class CacheManager:
             with self._cache_lock:
                 cached_results = {}
                 uncached_tokens = []
+                pending_flights = {}
                 
                 # Check cache for each token
                 for token in token_addresses:
@@ -345,33 +367,59 @@ class CacheManager:
                     
                     if cached_price is not None:
                         cached_results[token] = cached_price
+                    elif token in self._token_flights:
+                        pending_flights[token] = self._token_flights[token]
                     else:
                         uncached_tokens.append(token)
                 
                 # All tokens cached - return immediately
-                if not uncached_tokens:
+                if not uncached_tokens and not pending_flights:
                     response_time = (time.time() - start_time) * 1000
                     self._update_metrics(self._token_metrics, hit=True, response_time_ms=response_time)
                     self.logger.info(f"Token cache HIT: {len(token_addresses)} tokens ({response_time:.1f}ms)")
                     return cached_results
                 
-                # Fetch uncached tokens
+                # Claim the remaining tokens so concurrent callers wait instead of refetching
+                flight = None
+                if uncached_tokens:
+                    flight = _InFlight()
+                    for token in uncached_tokens:
+                        self._token_flights[token] = flight
+            
+            if flight is not None:
                 self.logger.info(f"Token cache PARTIAL: {len(cached_results)} cached, {len(uncached_tokens)} fetching")
-                new_prices = fetch_func(uncached_tokens)
-                
-                # Cache new prices
-                for token, price_data in new_prices.items():
-                    cache_key = self._generate_cache_key("token_price", address=token)
-                    self._token_cache[cache_key] = price_data
+                try:
+                    new_prices = fetch_func(uncached_tokens)
+                    flight.result = new_prices
+                    self._cache_token_prices(new_prices)
+                finally:
+                    self._finish_flight(self._token_flights, uncached_tokens, flight)
                 
                 # Combine results
                 cached_results.update(new_prices)
-                
-                response_time = (time.time() - start_time) * 1000
-                hit = len(uncached_tokens) == 0
-                self._update_metrics(self._token_metrics, hit=hit, response_time_ms=response_time)
-                
-                return cached_results
+            
+            # Pick up tokens fetched by other callers; a fetch that raised (no result) or
+            # is still running at the deadline leaves its tokens for this call to fetch
+            undelivered_tokens = []
+            deadline = time.time() + self.config.inflight_wait_timeout
+            for token, pending in pending_flights.items():
+                if pending.done.wait(max(deadline - time.time(), 0)) and pending.result is not None:
+                    if token in pending.result:
+                        cached_results[token] = pending.result[token]
+                else:
+                    undelivered_tokens.append(token)
+            
+            if undelivered_tokens:
+                self.logger.warning(f"Token cache WAIT: {len(undelivered_tokens)} tokens not delivered by in-flight fetches, fetching directly")
+                fetched_prices = fetch_func(undelivered_tokens)
+                self._cache_token_prices(fetched_prices)
+                cached_results.update(fetched_prices)
+            
+            response_time = (time.time() - start_time) * 1000
+            hit = not uncached_tokens and not undelivered_tokens
+            self._update_metrics(self._token_metrics, hit=hit, response_time_ms=response_time)
+            
+            return cached_results
                 
         except Exception as e:
             response_time = (time.time() - start_time) * 1000
@@ -391,6 +439,9 @@ class CacheManager:
         """
         Get report with caching.
         
+        Reports are generated outside the cache lock. A caller asking for a report that
+        is already being generated waits for it instead of generating it again.
+        
         Args:
             cache_key_params: Parameters to generate cache key
             generate_func: Function to call for generating uncached report
@@ -414,9 +465,26 @@ class CacheManager:
                     self.logger.info(f"Report cache HIT: {cache_key[:50]}... ({response_time:.1f}ms)")
                     return cached_report
                 
+                flight = self._report_flights.get(cache_key)
+                is_leader = flight is None
+                if is_leader:
+                    flight = self._report_flights[cache_key] = _InFlight()
+            
+            if not is_leader:
+                # Same report is already being generated; share its result
+                self.logger.info(f"Report cache WAIT: {cache_key[:50]}... - Joining in-flight generation")
+                if flight.done.wait(self.config.inflight_wait_timeout) and flight.result is not None:
+                    response_time = (time.time() - start_time) * 1000
+                    self._update_metrics(self._report_metrics, hit=True, response_time_ms=response_time)
+                    return flight.result
+                # The generation we waited on failed outright or is still running; generate independently
+                return generate_func()
+            
+            try:
                 # Generate new report
                 self.logger.info(f"Report cache MISS: {cache_key[:50]}... - Generating new report")
                 report_data = generate_func()
+                flight.result = report_data
                 
                 # Cache the result (but only if it's valid)
                 if report_data and not report_data.get('error'):
@@ -424,11 +492,13 @@ class CacheManager:
                     self.logger.info(f"Report cached successfully: {cache_key[:50]}...")
                 else:
                     self.logger.warning(f"Report not cached due to error: {report_data.get('error', 'Unknown error')}")
-                
-                response_time = (time.time() - start_time) * 1000
-                self._update_metrics(self._report_metrics, hit=False, response_time_ms=response_time)
-                
-                return report_data
+            finally:
+                self._finish_flight(self._report_flights, [cache_key], flight)
+            
+            response_time = (time.time() - start_time) * 1000
+            self._update_metrics(self._report_metrics, hit=False, response_time_ms=response_time)
+            
+            return report_data
                 
         except Exception as e:
             response_time = (time.time() - start_time) * 1000
@@ -443,6 +513,21 @@ class CacheManager:
                 self.logger.error(f"Report generation fallback failed: {str(fallback_error)}")
                 return {"error": "Report generation failed", "wallets": []}
     
+    def _cache_token_prices(self, prices: Dict[str, Any]):
+        """Store freshly fetched token prices in the token cache."""
+        with self._cache_lock:
+            for token, price_data in prices.items():
+                cache_key = self._generate_cache_key("token_price", address=token)
+                self._token_cache[cache_key] = price_data
+    
+    def _finish_flight(self, flights: Dict[str, '_InFlight'], keys: List[str], flight: '_InFlight'):
+        """Release keys claimed by a finished fetch and wake its waiters."""
+        with self._cache_lock:
+            for key in keys:
+                if flights.get(key) is flight:
+                    del flights[key]
+        flight.done.set()
+    
     def clear_cache(self, cache_type: str = "all"):
         """
         Clear cache contents.
@@ -4,6 +4,9 @@ import sqlite3
 from datetime import datetime
 import pytz
 
+# Batches at least this large refresh planner statistics for the tables they touched
+ANALYZE_AFTER_ROWS = 10_000
+
 class BaseSQLiteHandler:
     """
     Base class for all database handlers.
@@ -48,6 +51,24 @@ class BaseSQLiteHandler:
         """
         return self.conn_manager.transaction
 
+    @property
+    def readTransaction(self):
+        """
+        Property to access read-only transaction context manager.
+        
+        Why property?
+        - Same interface as transaction
+        - Reports get one consistent snapshot without write locks
+        
+        Usage:
+            with handler.readTransaction() as cursor:
+                # perform read operations
+        
+        Returns:
+            Context manager for read-only transactions
+        """
+        return self.conn_manager.read_transaction
+
     @property
     def tableLock(self):
         """
@@ -83,6 +104,53 @@ class BaseSQLiteHandler:
         """
         self.conn_manager.close()
 
+    @staticmethod
+    def addColumnIfMissing(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> bool:
+        """
+        Adds a column to an existing table if it is not already present.
+        
+        Why needed?
+        - CREATE TABLE IF NOT EXISTS never alters tables created by older versions
+        - Lets handlers evolve their schema in place on startup
+        
+        Args:
+            cursor: Database cursor
+            table: Table to alter
+            column: Column name to add
+            definition: Column type and constraints (e.g. 'INTEGER')
+            
+        Returns:
+            bool: True if the column was added, False if it already existed
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        if any(row[1] == column for row in cursor.fetchall()):
+            return False
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    @staticmethod
+    def analyzeIfLarge(cursor: sqlite3.Cursor, rowCount: int, *tables: str) -> bool:
+        """
+        Runs ANALYZE on the given tables after a bulk write.
+        
+        Why needed?
+        - Planner statistics go stale after large ingests
+        - Stale stats can make SQLite pick a worse index for later reads
+        
+        Args:
+            cursor: Database cursor
+            rowCount: Number of rows the batch wrote
+            tables: Tables to analyze
+            
+        Returns:
+            bool: True if ANALYZE ran
+        """
+        if rowCount < ANALYZE_AFTER_ROWS:
+            return False
+        for table in tables:
+            cursor.execute(f"ANALYZE {table}")
+        return True
+
     @staticmethod
     def getCurrentIstTime() -> datetime:
         """Get current time in IST timezone"""
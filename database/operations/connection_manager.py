@@ -1,3 +1,5 @@
+import os
+import queue
 import sqlite3
 import threading
 from contextlib import contextmanager
@@ -6,6 +8,27 @@ from logs.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Compiled statements kept per connection; handlers reuse constant SQL text across calls
+CACHED_STATEMENTS = 256
+# Idle connections kept open for reuse once a thread releases its connection
+POOL_SIZE = 8
+# Busy handler wait before SQLITE_BUSY is raised, in milliseconds
+BUSY_TIMEOUT_MS = 5000
+# Pages of WAL growth before an automatic checkpoint
+WAL_AUTOCHECKPOINT_PAGES = 1000
+# Page cache per connection; negative values are KiB (64 MiB)
+CACHE_SIZE_KIB = 65536
+# Memory-mapped I/O window (256 MiB), only enabled on hosts with at least MIN_RAM_FOR_MMAP of RAM
+MMAP_SIZE_BYTES = 268435456
+MIN_RAM_FOR_MMAP = 2 * 1024 ** 3
+
+def _physicalMemoryBytes() -> int:
+    """Total physical RAM, or 0 when the platform does not expose it"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return 0
+
 class DatabaseConnectionManager:
     """
     Manages SQLite database connections with thread safety.
@@ -13,7 +36,7 @@ class DatabaseConnectionManager:
     
     Key features:
     - Thread-safe connections
-    - Connection pooling
+    - Connection pooling (released connections are parked, not closed)
     - Table-level locking
     - Transaction management
     """
@@ -46,6 +69,7 @@ class DatabaseConnectionManager:
             if cls._instance is None:
                 cls._instance = super(DatabaseConnectionManager, cls).__new__(cls)
                 cls._instance.db_path = db_path
+                cls._instance._pool = queue.Queue(maxsize=POOL_SIZE)
             return cls._instance
 
     @contextmanager
@@ -60,17 +84,54 @@ class DatabaseConnectionManager:
         
         How it works:
         1. Checks if thread has a connection
-        2. Creates new connection if needed
+        2. Borrows an idle pooled connection, or creates one if the pool is empty
         3. Returns connection for use
-        4. Connection persists for thread lifetime
+        4. Connection stays with the thread until close() hands it back to the pool
         
         Returns:
             sqlite3.Connection: Database connection
         """
         if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path)
-            self._local.connection.row_factory = sqlite3.Row
-        yield self._local.connection
+            self._local.connection = self._acquireConnection()
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            yield self._local.connection
+        finally:
+            self._local.depth -= 1
+
+    def _acquireConnection(self) -> sqlite3.Connection:
+        """Reuses an idle pooled connection (page cache already warm) or opens a new one"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        # Pooled connections move between threads, but each is only ever used by one thread at a time
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        self._configureConnection(conn)
+        return conn
+
+    def _configureConnection(self, conn: sqlite3.Connection) -> None:
+        """
+        Applies per-connection PRAGMAs right after the connection is opened.
+        
+        Why needed?
+        - WAL + synchronous=NORMAL drops the fsync per commit and lets readers
+          run alongside a writer
+        - Default page cache is only ~2 MiB, too small for full-table reads
+        - mmap lets SQLite read pages without a pread() per page miss
+        - mmap is skipped on small hosts so it cannot crowd out the process
+        
+        Must run on a fresh connection, outside any transaction.
+        """
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        if _physicalMemoryBytes() >= MIN_RAM_FOR_MMAP:
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
 
     @contextmanager
     def transaction(self) -> Generator[sqlite3.Cursor, None, None]:
@@ -89,6 +150,10 @@ class DatabaseConnectionManager:
         4. Commits if successful
         5. Rolls back if error occurs
         
+        Inside a read_transaction on the same thread it joins that transaction
+        instead: nothing is committed (the read snapshot stays open) and, as
+        query_only is still on, a write fails instead of ending the snapshot.
+        
         Usage:
             with db.transaction() as cursor:
                 cursor.execute("INSERT INTO...")
@@ -98,6 +163,9 @@ class DatabaseConnectionManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if getattr(self._local, 'readDepth', 0):
+                yield cursor
+                return
             try:
                 yield cursor
                 conn.commit()
@@ -106,6 +174,53 @@ class DatabaseConnectionManager:
                 logger.error(f"Transaction rolled back due to error: {str(e)}")
                 raise e
 
+    @contextmanager
+    def read_transaction(self) -> Generator[sqlite3.Cursor, None, None]:
+        """
+        Provides a read-only transaction context for multi-statement reports.
+        
+        Why needed?
+        - sqlite3 only opens a transaction before DML, so consecutive SELECTs
+          each take and drop their own read snapshot
+        - BEGIN DEFERRED holds one WAL snapshot (SHARED lock only) for the
+          whole block, so every query sees the same data
+        - query_only makes an accidental write fail instead of upgrading the lock
+        
+        Nested inside an open transaction it reuses that transaction and only
+        toggles query_only (nested read transactions leave it to the outermost).
+        The transaction it opens is rolled back if the block raises.
+        
+        Usage:
+            with db.read_transaction() as cursor:
+                cursor.execute("SELECT ...")
+        
+        Returns:
+            sqlite3.Cursor: Database cursor for read operations
+        """
+        with self.get_connection() as conn:
+            readDepth = getattr(self._local, 'readDepth', 0)
+            ownsTransaction = not conn.in_transaction
+            if ownsTransaction:
+                conn.execute("BEGIN DEFERRED")
+            if readDepth == 0:
+                conn.execute("PRAGMA query_only=ON")
+            self._local.readDepth = readDepth + 1
+            cursor = conn.cursor()
+            succeeded = False
+            try:
+                yield cursor
+                succeeded = True
+            finally:
+                cursor.close()
+                self._local.readDepth = readDepth
+                if readDepth == 0:
+                    conn.execute("PRAGMA query_only=OFF")
+                if ownsTransaction:
+                    if succeeded:
+                        conn.commit()
+                    else:
+                        conn.rollback()
+
     @contextmanager
     def table_lock(self, table_name: str):
         """
@@ -135,18 +250,50 @@ class DatabaseConnectionManager:
 
     def close(self):
         """
-        Closes the thread's database connection.
+        Releases the thread's database connection back to the pool.
         
         Why needed?
         - Releases database resources
         - Prevents connection leaks
-        - Proper cleanup
+        - Keeps warm connections for the next caller instead of reopening
         
         When to use:
-        - Application shutdown
         - Thread completion
+        - End of a request
         - Resource cleanup
+        
+        A close() issued while the thread is still inside get_connection()/transaction()
+        (e.g. a nested 'with SQLitePortfolioDB()') is ignored; the outer scope releases it.
         """
-        if hasattr(self._local, 'connection'):
-            self._local.connection.close()
-            del self._local.connection 
\ No newline at end of file
+        if not hasattr(self._local, 'connection') or getattr(self._local, 'depth', 0) > 0:
+            return
+        conn = self._local.connection
+        del self._local.connection
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            self._closeConnection(conn)
+
+    def close_all(self):
+        """
+        Closes the thread's connection and every idle pooled connection.
+        
+        When to use:
+        - Application shutdown
+        """
+        self.close()
+        while True:
+            try:
+                self._closeConnection(self._pool.get_nowait())
+            except queue.Empty:
+                break
+
+    def _closeConnection(self, conn: sqlite3.Connection) -> None:
+        """Lets SQLite refresh any planner statistics it considers stale, then closes"""
+        try:
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.warning(f"PRAGMA optimize failed on close: {str(e)}")
+        conn.close()
@@ -31,6 +31,8 @@ class PortfolioSummary:
     status: int = 1
     firstseen: Optional[datetime] = None  # Changed from firstSeen to match column name
     lastseen: Optional[datetime] = None   # Changed from lastSeen to match column name
+    firstseen_ts: Optional[int] = None  # UNIX epoch seconds mirror of firstseen
+    lastseen_ts: Optional[int] = None   # UNIX epoch seconds mirror of lastseen
     createdat: Optional[datetime] = None
     updatedat: Optional[datetime] = None
     tags: List[str] = field(default_factory=list)
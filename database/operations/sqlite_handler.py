@@ -171,6 +171,15 @@ class SQLitePortfolioDB:
         """
         self.conn_manager.close()
 
+    def close_all(self):
+        """
+        Close every pooled database connection.
+        
+        When to use:
+        - When shutting down the application
+        """
+        self.conn_manager.close_all()
+
     def execute_query(self, query: str, params=None):
         """
         Execute a raw SQL query and return the results.
@@ -224,6 +233,20 @@ class SQLitePortfolioDB:
         """
         return self.conn_manager.transaction
 
+    @property
+    def read_transaction(self):
+        """
+        Property to access the read-only transaction context manager.
+        
+        How to use:
+        with db.read_transaction() as cursor:
+            # run several SELECTs against one snapshot
+            
+        Returns:
+            Context manager for read-only transactions
+        """
+        return self.conn_manager.read_transaction
+
     @property
     def table_lock(self):
         """
@@ -3,6 +3,7 @@ from database.operations.schema import PortfolioSummary
 from typing import List, Dict, Optional, Set
 from decimal import Decimal
 import json
+import logging
 import sqlite3
 from logs.logger import get_logger
 from config.PortfolioStatusEnum import PortfolioStatus
@@ -13,6 +14,131 @@ logger = get_logger(__name__)
 
 IST = pytz.timezone('Asia/Kolkata')
 
+# Keeps the IN (...) list of a history snapshot well under SQLite's bound-variable limit
+HISTORY_SNAPSHOT_CHUNK_SIZE = 500
+
+_SUMMARY_COLUMNS = """
+    chainname, tokenid, name, tokenage, mcap, currentprice,
+    avgprice, smartbalance, walletsinvesting1000,
+    walletsinvesting5000, walletsinvesting10000,
+    qtychange1d, qtychange7d, qtychange30d, status, tags,
+    firstseen, lastseen, createdat, updatedat,
+    firstseen_ts, lastseen_ts
+"""
+
+_HISTORY_COLUMNS = """
+    portsummaryid, tokenid, chainname, name, tokenage,
+    mcap, currentprice, avgprice, smartbalance,
+    walletsinvesting1000, walletsinvesting5000,
+    walletsinvesting10000, qtychange1d, qtychange7d,
+    qtychange30d, status, tags, createdat, updatedat
+"""
+
+# Statement text is kept constant so sqlite3's per-connection statement cache reuses the compiled plan
+INSERT_SUMMARY_SQL = f"""
+    INSERT INTO portsummary ({_SUMMARY_COLUMNS})
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+# Existing rows keep createdat and firstseen; lastseen/updatedat/lastseen_ts are bound after the VALUES
+UPSERT_SUMMARY_SQL = INSERT_SUMMARY_SQL + """
+    ON CONFLICT(tokenid) DO UPDATE SET
+        chainname = excluded.chainname, name = excluded.name,
+        tokenage = excluded.tokenage, mcap = excluded.mcap,
+        currentprice = excluded.currentprice, avgprice = excluded.avgprice,
+        smartbalance = excluded.smartbalance,
+        walletsinvesting1000 = excluded.walletsinvesting1000,
+        walletsinvesting5000 = excluded.walletsinvesting5000,
+        walletsinvesting10000 = excluded.walletsinvesting10000,
+        qtychange1d = excluded.qtychange1d, qtychange7d = excluded.qtychange7d,
+        qtychange30d = excluded.qtychange30d, status = excluded.status,
+        tags = excluded.tags, lastseen = ?, updatedat = ?, lastseen_ts = ?
+"""
+
+UPDATE_SUMMARY_SQL = """
+    UPDATE portsummary SET
+        chainname = ?, name = ?, tokenage = ?, mcap = ?,
+        currentprice = ?, avgprice = ?, smartbalance = ?,
+        walletsinvesting1000 = ?, walletsinvesting5000 = ?,
+        walletsinvesting10000 = ?, qtychange1d = ?,
+        qtychange7d = ?, qtychange30d = ?, status = ?,
+        tags = ?, lastseen = ?, updatedat = ?, lastseen_ts = ?
+    WHERE tokenid = ?
+"""
+
+INSERT_HISTORY_SQL = f"""
+    INSERT INTO portsummaryhistory ({_HISTORY_COLUMNS})
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+# Tags as a JSON array, the way insertHistory stores them: JSON tags are kept as-is, comma-separated
+# tags written by the tagger are split, whitespace-trimmed and empty entries dropped. {tags} is the column.
+_TAGS_AS_JSON_SQL = """
+        CASE
+            WHEN {tags} IS NULL OR {tags} = '' THEN '[]'
+            WHEN json_valid({tags}) THEN {tags}
+            ELSE (
+                WITH RECURSIVE split(tag, rest) AS (
+                    SELECT NULL, {tags} || ','
+                    UNION ALL
+                    SELECT trim(substr(rest, 1, instr(rest, ',') - 1), ' ' || char(9, 10, 13)),
+                           substr(rest, instr(rest, ',') + 1)
+                    FROM split
+                    WHERE rest <> ''
+                )
+                SELECT json_group_array(tag) FROM split WHERE tag <> ''
+            )
+        END"""
+
+# {placeholders} is filled per chunk
+SNAPSHOT_HISTORY_SQL = f"""
+    INSERT INTO portsummaryhistory ({_HISTORY_COLUMNS})
+    SELECT
+        portsummaryid, tokenid, chainname, name, tokenage,
+        mcap, currentprice, avgprice, smartbalance,
+        walletsinvesting1000, walletsinvesting5000,
+        walletsinvesting10000, qtychange1d, qtychange7d,
+        qtychange30d, status,{_TAGS_AS_JSON_SQL.format(tags='tags')},
+        COALESCE(createdat, ?), ?
+    FROM portsummary
+    WHERE tokenid IN ({{placeholders}})
+    RETURNING tokenid
+"""
+
+# Older portsummary rows for a tokenid that appears more than once; the newest row (highest
+# portsummaryid) is kept and the others are archived against it before the unique index is built
+ARCHIVE_DUPLICATE_SUMMARIES_SQL = f"""
+    INSERT INTO portsummaryhistory ({_HISTORY_COLUMNS})
+    SELECT
+        k.keptid, p.tokenid, p.chainname, p.name, p.tokenage,
+        p.mcap, p.currentprice, p.avgprice, p.smartbalance,
+        p.walletsinvesting1000, p.walletsinvesting5000,
+        p.walletsinvesting10000, p.qtychange1d, p.qtychange7d,
+        p.qtychange30d, p.status,{_TAGS_AS_JSON_SQL.format(tags='p.tags')},
+        COALESCE(p.createdat, ?), ?
+    FROM portsummary p
+    JOIN (
+        SELECT tokenid, MAX(portsummaryid) AS keptid
+        FROM portsummary
+        GROUP BY tokenid
+        HAVING COUNT(*) > 1
+    ) k ON k.tokenid = p.tokenid
+    WHERE p.portsummaryid <> k.keptid
+"""
+
+DELETE_DUPLICATE_SUMMARIES_SQL = """
+    DELETE FROM portsummary
+    WHERE portsummaryid NOT IN (SELECT MAX(portsummaryid) FROM portsummary GROUP BY tokenid)
+"""
+
+def toEpochSeconds(value) -> Optional[int]:
+    """Convert a datetime (or ISO string read back from SQLite) to UNIX epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
 class PortfolioHandler(BaseSQLiteHandler):
     def __init__(self, conn_manager):
         super().__init__(conn_manager)  # Properly initialize base class
@@ -43,10 +169,21 @@ class PortfolioHandler(BaseSQLiteHandler):
                     createdat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updatedat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     tags TEXT,
-                    markedinactive TIMESTAMP
+                    markedinactive TIMESTAMP,
+                    firstseen_ts INTEGER,
+                    lastseen_ts INTEGER
                 )
             ''')
-            
+
+            # Epoch mirrors of firstseen/lastseen for tables created before they existed.
+            # Stored TIMESTAMP values are naive local time, hence the 'utc' modifier.
+            if self.addColumnIfMissing(cursor, 'portsummary', 'firstseen_ts', 'INTEGER'):
+                cursor.execute("UPDATE portsummary SET firstseen_ts = CAST(strftime('%s', firstseen, 'utc') AS INTEGER)")
+            if self.addColumnIfMissing(cursor, 'portsummary', 'lastseen_ts', 'INTEGER'):
+                cursor.execute("UPDATE portsummary SET lastseen_ts = CAST(strftime('%s', lastseen, 'utc') AS INTEGER)")
+
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_portsummary_status_lastseen_ts ON portsummary(status, lastseen_ts)')
+
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS portsummaryhistory (
                     historyid INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -73,29 +210,27 @@ class PortfolioHandler(BaseSQLiteHandler):
                 )
             ''')
 
-    def insertSummary(self, item: PortfolioSummary, cursor: Optional[sqlite3.Cursor] = None) -> None:
-        currentTime = datetime.now()
-        
-        # Ensure timestamp fields are set
-        if not hasattr(item, 'firstseen') or item.firstseen is None:
-            item.firstseen = currentTime
-        if not hasattr(item, 'lastseen') or item.lastseen is None:
-            item.lastseen = currentTime
-        if not hasattr(item, 'createdat') or item.createdat is None:
-            item.createdat = currentTime
-        if not hasattr(item, 'updatedat') or item.updatedat is None:
-            item.updatedat = currentTime
-        
-        query = """
-            INSERT INTO portsummary (
-                chainname, tokenid, name, tokenage, mcap, currentprice,
-                avgprice, smartbalance, walletsinvesting1000,
-                walletsinvesting5000, walletsinvesting10000,
-                qtychange1d, qtychange7d, qtychange30d, status, tags,
-                firstseen, lastseen, createdat, updatedat
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """
-        params = (
+            # Required as the conflict target for the UPSERT in persistPortfolioSummaryData.
+            # Tables written before the index existed may hold several rows per tokenid,
+            # which would make the CREATE fail and leave the UPSERT without a conflict target.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_portsummary_tokenid'")
+            if cursor.fetchone() is None:
+                self._archiveDuplicateSummaries(cursor)
+                cursor.execute('CREATE UNIQUE INDEX idx_portsummary_tokenid ON portsummary(tokenid)')
+
+    @staticmethod
+    def _archiveDuplicateSummaries(cursor: sqlite3.Cursor) -> None:
+        """Keep the newest portsummary row per tokenid, copying the older ones into portsummaryhistory"""
+        timestamp = datetime.now()
+        cursor.execute(ARCHIVE_DUPLICATE_SUMMARIES_SQL, (timestamp, timestamp))
+        if cursor.rowcount > 0:
+            cursor.execute(DELETE_DUPLICATE_SUMMARIES_SQL)
+            logger.warning(f"Archived {cursor.rowcount} duplicate portsummary rows before creating idx_portsummary_tokenid")
+
+    @staticmethod
+    def _summaryParams(item: PortfolioSummary) -> tuple:
+        """Bind parameters for INSERT_SUMMARY_SQL (and the VALUES part of UPSERT_SUMMARY_SQL)"""
+        return (
             item.chainname, item.tokenid, item.name, item.tokenage,
             str(item.mcap), str(item.currentprice), str(item.avgprice),
             str(item.smartbalance), item.walletsinvesting1000,
@@ -103,53 +238,64 @@ class PortfolioHandler(BaseSQLiteHandler):
             str(item.qtychange1d), str(item.qtychange7d),
             str(item.qtychange30d), item.status,
             json.dumps(item.tags) if item.tags else '[]',
-            item.firstseen, item.lastseen, item.createdat, item.updatedat
+            item.firstseen, item.lastseen, item.createdat, item.updatedat,
+            toEpochSeconds(item.firstseen), toEpochSeconds(item.lastseen)
         )
 
+    @staticmethod
+    def _fillSummaryDefaults(item: PortfolioSummary, currentTime: datetime) -> None:
+        """Ensure timestamp fields are set before an insert"""
+        if not hasattr(item, 'firstseen') or item.firstseen is None:
+            item.firstseen = currentTime
+        if not hasattr(item, 'lastseen') or item.lastseen is None:
+            item.lastseen = currentTime
+        if not hasattr(item, 'createdat') or item.createdat is None:
+            item.createdat = currentTime
+        if not hasattr(item, 'updatedat') or item.updatedat is None:
+            item.updatedat = currentTime
+
+    @staticmethod
+    def _execInsertSummary(cursor: sqlite3.Cursor, params: tuple) -> None:
+        cursor.execute(INSERT_SUMMARY_SQL, params)
+
+    @staticmethod
+    def _execUpdateSummary(cursor: sqlite3.Cursor, params: tuple) -> None:
+        cursor.execute(UPDATE_SUMMARY_SQL, params)
+
+    @staticmethod
+    def _execInsertHistory(cursor: sqlite3.Cursor, params: tuple) -> None:
+        cursor.execute(INSERT_HISTORY_SQL, params)
+
+    def insertSummary(self, item: PortfolioSummary, cursor: Optional[sqlite3.Cursor] = None) -> None:
+        self._fillSummaryDefaults(item, datetime.now())
+        params = self._summaryParams(item)
+
         if cursor:
-            cursor.execute(query, params)
+            self._execInsertSummary(cursor, params)
         else:
             with self.conn_manager.transaction() as cur:
-                cur.execute(query, params)
+                self._execInsertSummary(cur, params)
 
     def updateSummary(self, item: PortfolioSummary, cursor: Optional[sqlite3.Cursor] = None) -> None:
         currentTime = datetime.now()
-        query = """
-            UPDATE portsummary SET
-                chainname = ?, name = ?, tokenage = ?, mcap = ?,
-                currentprice = ?, avgprice = ?, smartbalance = ?,
-                walletsinvesting1000 = ?, walletsinvesting5000 = ?,
-                walletsinvesting10000 = ?, qtychange1d = ?,
-                qtychange7d = ?, qtychange30d = ?, status = ?,
-                tags = ?, lastseen = ?, updatedat = ?
-            WHERE tokenid = ?
-        """
         params = (
             item.chainname, item.name, item.tokenage, str(item.mcap),
             str(item.currentprice), str(item.avgprice), str(item.smartbalance),
             item.walletsinvesting1000, item.walletsinvesting5000,
             item.walletsinvesting10000, str(item.qtychange1d),
             str(item.qtychange7d), str(item.qtychange30d), item.status,
-            json.dumps(item.tags) if item.tags else '[]', currentTime, currentTime, item.tokenid
+            json.dumps(item.tags) if item.tags else '[]', currentTime, currentTime,
+            int(currentTime.timestamp()), item.tokenid
         )
 
         if cursor:
-            cursor.execute(query, params)
+            self._execUpdateSummary(cursor, params)
         else:
             with self.conn_manager.transaction() as cur:
-                cur.execute(query, params)
+                self._execUpdateSummary(cur, params)
 
     def insertHistory(self, item: PortfolioSummary, cursor: Optional[sqlite3.Cursor] = None) -> None:
         current_time = datetime.now()
-        query = """
-            INSERT INTO portsummaryhistory (
-                portsummaryid, tokenid, chainname, name, tokenage,
-                mcap, currentprice, avgprice, smartbalance,
-                walletsinvesting1000, walletsinvesting5000,
-                walletsinvesting10000, qtychange1d, qtychange7d,
-                qtychange30d, status, tags, createdat, updatedat
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """
         
         # Ensure createdat is not None
         item_createdat = item.createdat if hasattr(item, 'createdat') and item.createdat is not None else current_time
@@ -186,10 +332,32 @@ class PortfolioHandler(BaseSQLiteHandler):
         )
 
         if cursor:
-            cursor.execute(query, params)
+            self._execInsertHistory(cursor, params)
         else:
             with self.conn_manager.transaction() as cur:
-                cur.execute(query, params)
+                self._execInsertHistory(cur, params)
+
+    def snapshotHistory(self, tokenIds: List[str], cursor: sqlite3.Cursor, timestamp: Optional[datetime] = None) -> Set[str]:
+        """
+        Copy the current portsummary rows for the given tokens into portsummaryhistory
+        in SQL, without round-tripping them through PortfolioSummary objects
+        
+        Args:
+            tokenIds: Token identifiers to snapshot (missing tokens are skipped)
+            cursor: Database cursor
+            timestamp: updatedat for the history rows, defaults to now
+            
+        Returns:
+            Set of token IDs that had an existing row
+        """
+        timestamp = timestamp or datetime.now()
+        snapshotted = set()
+        for start in range(0, len(tokenIds), HISTORY_SNAPSHOT_CHUNK_SIZE):
+            chunk = tokenIds[start:start + HISTORY_SNAPSHOT_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(SNAPSHOT_HISTORY_SQL.format(placeholders=placeholders), [timestamp, timestamp] + chunk)
+            snapshotted.update(row[0] for row in cursor.fetchall())
+        return snapshotted
 
     def getTokenData(self, token_ids: List[str]) -> List[PortfolioSummary]:
         """
@@ -295,7 +463,8 @@ class PortfolioHandler(BaseSQLiteHandler):
             int: Number of records marked as inactive
         """
         currentTime = datetime.now()
-        cutoffDate = (currentTime - timedelta(days=2)).strftime('%Y-%m-%d %H:%M:%S')
+        cutoffTime = currentTime - timedelta(days=2)
+        cutoffDate = cutoffTime.strftime('%Y-%m-%d %H:%M:%S')
         
         logger.info(f"Deactivating tokens not seen since: {cutoffDate}")
         
@@ -304,9 +473,9 @@ class PortfolioHandler(BaseSQLiteHandler):
             SELECT portsummaryid, tokenid, name, lastseen
             FROM portsummary 
             WHERE status = ?  -- Active records only
-            AND lastseen < ?  -- More than 2 days old
+            AND lastseen_ts < ?  -- More than 2 days old
             AND (markedinactive IS NULL OR status != ?)  -- Not already marked inactive
-        """, (PortfolioStatus.ACTIVE.statuscode, cutoffDate, PortfolioStatus.INACTIVE.statuscode))
+        """, (PortfolioStatus.ACTIVE.statuscode, int(cutoffTime.timestamp()), PortfolioStatus.INACTIVE.statuscode))
         
         tokensToDeactivate = cursor.fetchall()
         
@@ -346,8 +515,8 @@ class PortfolioHandler(BaseSQLiteHandler):
             cursor.execute("""
                 SELECT * FROM portsummary 
                 WHERE status = ? 
-                AND lastseen >= ?
-            """, (PortfolioStatus.ACTIVE.statuscode, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
+                AND lastseen_ts >= ?
+            """, (PortfolioStatus.ACTIVE.statuscode, int(timestamp.timestamp())))
             return [PortfolioSummary(**dict(row)) for row in cursor.fetchall()]
 
     def updateTokenTags(self, cursor: sqlite3.Cursor, tokenId: str, tags: str, timestamp: datetime) -> None:
@@ -468,6 +637,7 @@ class PortfolioHandler(BaseSQLiteHandler):
             int: Number of affected rows
         """
         affected_count = 0
+        debugEnabled = logger.isEnabledFor(logging.DEBUG)
         
         for token_id in tokens_to_mark_inactive:
             try:
@@ -487,7 +657,8 @@ class PortfolioHandler(BaseSQLiteHandler):
                 
                 if cursor.rowcount > 0:
                     affected_count += cursor.rowcount
-                    logger.info(f"Marked token {token_id} as inactive during update")
+                    if debugEnabled:
+                        logger.debug(f"Marked token {token_id} as inactive during update")
                     
             except Exception as e:
                 logger.error(f"Failed to mark token {token_id} as inactive: {str(e)}")
@@ -515,46 +686,36 @@ class PortfolioHandler(BaseSQLiteHandler):
             
         try:
             tokenIds = [item.tokenid for item in items]
-            existingRecords = self.getTokenData(tokenIds)
-            existingMap = {record.tokenid: record for record in existingRecords}
             current_time = datetime.now()
+            current_time_ts = int(current_time.timestamp())
+            current_time_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
             
-            updated_count = 0
-            inserted_count = 0
+            for item in items:
+                # Ensure status is set to ACTIVE
+                item.status = PortfolioStatus.ACTIVE.statuscode
+                self._fillSummaryDefaults(item, current_time)
+
+            # Existing rows keep createdat and firstseen; the update side mirrors updateSummary
+            updateTail = (current_time, current_time, current_time_ts)
+            upsertParams = [self._summaryParams(item) + updateTail for item in items]
+
+            debugEnabled = logger.isEnabledFor(logging.DEBUG)
 
             with self.conn_manager.transaction() as cursor:
+                # Snapshot existing rows into history before they are overwritten
+                existingIds = self.snapshotHistory(tokenIds, cursor, current_time)
+
+                cursor.executemany(UPSERT_SUMMARY_SQL, upsertParams)
+
+            if debugEnabled:
                 for item in items:
-                    try:
-                        # Ensure status is set to ACTIVE
-                        item.status = PortfolioStatus.ACTIVE.statuscode
-                        
-                        # Ensure createdat and updatedat are set
-                        if not hasattr(item, 'createdat') or item.createdat is None:
-                            item.createdat = current_time
-                        if not hasattr(item, 'updatedat') or item.updatedat is None:
-                            item.updatedat = current_time
-                        
-                        if item.tokenid in existingMap:
-                            # Insert history record first
-                            existing_item = existingMap[item.tokenid]
-                            # Preserve original createdat from existing record
-                            if hasattr(existing_item, 'createdat') and existing_item.createdat is not None:
-                                item.createdat = existing_item.createdat
-                            self.insertHistory(existing_item, cursor)
-                            # Then update current record
-                            self.updateSummary(item, cursor)
-                            updated_count += 1
-                            logger.info(f"Updated existing record for token {item.tokenid} with name {item.name} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with market age {market_age}")
-                        else:
-                            # Insert new record
-                            self.insertSummary(item, cursor)
-                            inserted_count += 1
-                            logger.info(f"Inserted new record for token {item.tokenid} with name {item.name} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with market age {market_age}")
-                    except Exception as e:
-                        logger.error(f"Failed to persist item {item.tokenid} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with market age {market_age}: {str(e)}")
-                        raise
-
-            logger.info(f"Successfully persisted {len(items)} items (updated: {updated_count}, inserted: {inserted_count}) at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with market age {market_age}")
+                    action = "Updated existing" if item.tokenid in existingIds else "Inserted new"
+                    logger.debug(f"{action} record for token {item.tokenid} with name {item.name} at {current_time_str} with market age {market_age}")
+
+            updated_count = len(existingIds)
+            inserted_count = len(items) - updated_count
+
+            logger.info(f"Successfully persisted {len(items)} items (updated: {updated_count}, inserted: {inserted_count}) at {current_time_str} with market age {market_age}")
             return {"updated": updated_count, "inserted": inserted_count}
             
         except Exception as e:
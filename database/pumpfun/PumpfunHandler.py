@@ -2,15 +2,161 @@ from decimal import Decimal
 from typing import Dict, List, Optional
 from datetime import datetime
 import json
+from types import MappingProxyType
 from database.operations.base_handler import BaseSQLiteHandler
 from database.operations.schema import PumpFunToken
+from cache.cache_manager import SimpleTTLCache
 from logs.logger import get_logger
 import pytz
 
 logger = get_logger(__name__)
 
+# Fixed-point scales for the INTEGER mirrors of the DECIMAL columns
+PRICE_SCALE = 10 ** 9        # price_u: nano-USD
+USD_SCALE = 10 ** 6          # marketcap_u / liquidity_u / volume24h_u: micro-USD
+CHANGE_PCT_SCALE = 10 ** 4   # change1hpct_bp: basis points x 100
+
+# (column, source DECIMAL column, scale) added to pumpfunstates and pumpfunhistory
+SCALED_COLUMNS = (
+    ('price_u', 'price', PRICE_SCALE),
+    ('marketcap_u', 'marketcap', USD_SCALE),
+    ('liquidity_u', 'liquidity', USD_SCALE),
+    ('volume24h_u', 'volume24h', USD_SCALE),
+    ('change1hpct_bp', 'change1hpct', CHANGE_PCT_SCALE),
+)
+
+def toScaledInt(value, scale: int) -> Optional[int]:
+    """Convert a Decimal (or number) to an integer count of 1/scale units, rounded"""
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * scale).to_integral_value())
+
+def sqliteTimestamp(value: datetime) -> str:
+    """
+    Format a datetime the way sqlite3's default adapter does, so a batch formats its
+    timestamp once and binds plain TEXT instead of adapting a datetime per row
+    """
+    return value.isoformat(" ")
+
+def localTimestamp(value: datetime) -> str:
+    """Format an aware datetime as naive local time, the form new-token rows have always used"""
+    return sqliteTimestamp(value.astimezone().replace(tzinfo=None))
+
+# JobRunner.addPumpFunJobs polls every 2 minutes (cron minute='*/2')
+PUMPFUN_POLL_INTERVAL_SECONDS = 120
+
+# Remembers the key metrics last known to be stored per tokenid so unchanged polls skip SQL.
+# Shared by every handler in the process, since each poll builds a fresh handler; the TTL
+# spans a few polls so the next run hits, and bounds staleness if the tables change elsewhere.
+PERSISTED_METRICS_CACHE_SIZE = 10_000
+PERSISTED_METRICS_CACHE_TTL = 3 * PUMPFUN_POLL_INTERVAL_SECONDS
+
+# Keeps IN (...) lookups under SQLite's default 999 bound-variable limit
+IN_CLAUSE_CHUNK_SIZE = 900
+
+# Statement text is kept constant so sqlite3's per-connection statement cache reuses the
+# compiled plan across the single-token and batch paths
+INSERT_INFO_SQL = """
+    INSERT INTO pumpfuninfo (
+        tokenid, name, tokenname, chain, tokendecimals,
+        circulatingsupply, tokenage, twitterlink, telegramlink,
+        websitelink, firstseenat, lastupdatedat, count
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+"""
+
+# RETURNING yields a row only when the token was actually inserted
+INSERT_INFO_IF_NEW_SQL = INSERT_INFO_SQL + """
+    ON CONFLICT(tokenid) DO NOTHING
+    RETURNING id
+"""
+
+BUMP_INFO_COUNT_SQL = """
+    UPDATE pumpfuninfo SET
+        count = count + 1,
+        lastupdatedat = ?
+    WHERE tokenid = ?
+"""
+
+# Key metrics whose change triggers a history snapshot + state update
+_STATE_CHANGED_PREDICATE = """
+    (buysolqty <> ? OR occurrencecount <> ?
+     OR percentilerankpeats IS NOT ? OR percentileranksol IS NOT ?)
+"""
+
+# Copies the stored state into history only when a key metric differs. Done before the
+# upsert because SQLite's RETURNING yields post-update values, not the previous row.
+SNAPSHOT_CHANGED_STATE_SQL = f"""
+    INSERT INTO pumpfunhistory (
+        tokenid, snapshotat, price, marketcap, liquidity,
+        volume24h, buysolqty, occurrencecount, percentilerankpeats,
+        percentileranksol, dexstatus, change1hpct, createdat,
+        price_u, marketcap_u, liquidity_u, volume24h_u, change1hpct_bp
+    )
+    SELECT
+        tokenid, lastupdatedat, price, marketcap, liquidity,
+        volume24h, buysolqty, occurrencecount, percentilerankpeats,
+        percentileranksol, dexstatus, change1hpct, ?,
+        price_u, marketcap_u, liquidity_u, volume24h_u, change1hpct_bp
+    FROM pumpfunstates
+    WHERE tokenid = ? AND {_STATE_CHANGED_PREDICATE}
+"""
+
+# Batch change check: one statement per chunk returns the tokenids (among the bound rows) whose
+# stored key metrics differ, with the same comparisons as _STATE_CHANGED_PREDICATE
+CHANGE_CHECK_ROW_PARAMS = 5
+CHANGE_CHECK_CHUNK_SIZE = IN_CLAUSE_CHUNK_SIZE // CHANGE_CHECK_ROW_PARAMS
+
+def changedStatesSql(rowCount: int) -> str:
+    """SELECT of the changed tokenids for rowCount bound (tokenid, *_changeParams) rows"""
+    values = ", ".join(["(?, ?, ?, ?, ?)"] * rowCount)
+    return f"""
+        WITH incoming (tokenid, buysolqty, occurrencecount, percentilerankpeats, percentileranksol) AS (
+            VALUES {values}
+        )
+        SELECT s.tokenid
+        FROM incoming i
+        JOIN pumpfunstates s ON s.tokenid = i.tokenid
+        WHERE s.buysolqty <> i.buysolqty OR s.occurrencecount <> i.occurrencecount
+           OR s.percentilerankpeats IS NOT i.percentilerankpeats
+           OR s.percentileranksol IS NOT i.percentileranksol
+    """
+
+# Inserts a new state row, or updates the existing one only when a key metric changed
+UPSERT_STATE_SQL = """
+    INSERT INTO pumpfunstates (
+        tokenid, price, marketcap, liquidity, volume24h,
+        buysolqty, occurrencecount, percentilerankpeats,
+        percentileranksol, dexstatus, change1hpct,
+        createdat, lastupdatedat,
+        price_u, marketcap_u, liquidity_u, volume24h_u, change1hpct_bp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tokenid) DO UPDATE SET
+        price = excluded.price,
+        marketcap = excluded.marketcap,
+        liquidity = excluded.liquidity,
+        volume24h = excluded.volume24h,
+        buysolqty = excluded.buysolqty,
+        occurrencecount = excluded.occurrencecount,
+        percentilerankpeats = excluded.percentilerankpeats,
+        percentileranksol = excluded.percentileranksol,
+        dexstatus = excluded.dexstatus,
+        change1hpct = excluded.change1hpct,
+        lastupdatedat = excluded.lastupdatedat,
+        price_u = excluded.price_u,
+        marketcap_u = excluded.marketcap_u,
+        liquidity_u = excluded.liquidity_u,
+        volume24h_u = excluded.volume24h_u,
+        change1hpct_bp = excluded.change1hpct_bp
+    WHERE pumpfunstates.buysolqty <> excluded.buysolqty
+       OR pumpfunstates.occurrencecount <> excluded.occurrencecount
+       OR pumpfunstates.percentilerankpeats IS NOT excluded.percentilerankpeats
+       OR pumpfunstates.percentileranksol IS NOT excluded.percentileranksol
+"""
+
 # Table Schema Documentation
-SCHEMA_DOCS = {
+_SCHEMA_DOCS = {
     "pumpfuninfo": {
         "id": "Internal unique ID",
         "tokenid": "Token's contract address",
@@ -63,11 +209,20 @@ SCHEMA_DOCS = {
     }
 }
 
+# Read-only view, shared by every handler instance
+SCHEMA_DOCS = MappingProxyType({table: MappingProxyType(columns) for table, columns in _SCHEMA_DOCS.items()})
+
 class PumpFunHandler(BaseSQLiteHandler):
+    _persistedMetrics = SimpleTTLCache(maxsize=PERSISTED_METRICS_CACHE_SIZE, ttl=PERSISTED_METRICS_CACHE_TTL)
+
     def __init__(self, conn_manager):
         super().__init__(conn_manager)
-        self.schema = SCHEMA_DOCS
         self._createTables()
+
+    @classmethod
+    def schema(cls) -> MappingProxyType:
+        """Column documentation for the pumpfun tables"""
+        return SCHEMA_DOCS
         
     def _createTables(self):
         """Creates all necessary tables for the system"""
@@ -110,6 +265,11 @@ class PumpFunHandler(BaseSQLiteHandler):
                     change1hpct DECIMAL NOT NULL,
                     createdat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     lastupdatedat TIMESTAMP,
+                    price_u INTEGER,
+                    marketcap_u INTEGER,
+                    liquidity_u INTEGER,
+                    volume24h_u INTEGER,
+                    change1hpct_bp INTEGER,
                     FOREIGN KEY(tokenid) REFERENCES pumpfuninfo(tokenid)
                 )
             ''')
@@ -131,14 +291,30 @@ class PumpFunHandler(BaseSQLiteHandler):
                     dexstatus BOOLEAN NOT NULL,
                     change1hpct DECIMAL NOT NULL,
                     createdat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    price_u INTEGER,
+                    marketcap_u INTEGER,
+                    liquidity_u INTEGER,
+                    volume24h_u INTEGER,
+                    change1hpct_bp INTEGER,
                     FOREIGN KEY(tokenid) REFERENCES pumpfuninfo(tokenid)
                 )
             ''')
 
+            # Fixed-point INTEGER mirrors for tables created before they existed
+            for table in ('pumpfunstates', 'pumpfunhistory'):
+                for column, source, scale in SCALED_COLUMNS:
+                    if self.addColumnIfMissing(cursor, table, column, 'INTEGER'):
+                        cursor.execute(f'UPDATE {table} SET {column} = CAST(ROUND({source} * {scale}) AS INTEGER)')
+
             # Create indices for better query performance
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_pumpfuninfo_tokenid ON pumpfuninfo(tokenid)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_pumpfunstates_tokenid ON pumpfunstates(tokenid)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pumpfunhistory_tokenid ON pumpfunhistory(tokenid)')
+            # (tokenid, snapshotat) serves getTokenHistory's range + ORDER BY without a sort step
+            # and covers plain tokenid lookups, so the single-column index is dropped
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pumpfunhistory_tokenid_snapshotat ON pumpfunhistory(tokenid, snapshotat)')
+            cursor.execute('DROP INDEX IF EXISTS idx_pumpfunhistory_tokenid')
+
+            cursor.execute('PRAGMA optimize')
 
     def insertTokenData(self, token: PumpFunToken) -> None:
         """
@@ -149,76 +325,158 @@ class PumpFunHandler(BaseSQLiteHandler):
         Args:
             token: PumpFunToken object to persist
         """
+        metrics = self._changeParams(token)
+        if self._persistedMetrics.get(token.tokenid) == metrics:
+            logger.debug(f"No changes for token {token.tokenid} since last persist, skipping")
+            return
+
         try:
             with self.conn_manager.transaction() as cursor:
-                self._handleTokenData(cursor, token)
+                inSync = self._handleTokenData(cursor, token)
         except Exception as e:
             logger.error(f"Failed to process token {token.tokenid}: {str(e)}")
             raise
 
-    def _handleTokenData(self, cursor, token: PumpFunToken) -> None:
-        """Handle token data insertion or update"""
-        # Check token existence and get current state in one query
-        cursor.execute('''
-            SELECT 
-                i.id as info_exists,
-                s.id as state_exists,
-                s.*
-            FROM pumpfuninfo i
-            LEFT JOIN pumpfunstates s ON i.tokenid = s.tokenid
-            WHERE i.tokenid = ?
-        ''', (token.tokenid,))
+        # Only after commit, and only if the stored state now carries these metrics
+        if inSync:
+            self._persistedMetrics[token.tokenid] = metrics
+
+    def insertTokenDataBatch(self, tokens: List[PumpFunToken]) -> None:
+        """
+        Batch variant of insertTokenData: same rules, but one transaction and one
+        executemany per statement instead of 2-4 statements per token
         
-        result = cursor.fetchone()
+        Args:
+            tokens: PumpFunToken objects to persist (last one wins for a repeated tokenid)
+        """
+        if not tokens:
+            return
+
+        tokensById = {token.tokenid: token for token in tokens}
+        # Drop tokens whose key metrics match what was last persisted
+        tokensById = {
+            tokenId: token for tokenId, token in tokensById.items()
+            if self._persistedMetrics.get(tokenId) != self._changeParams(token)
+        }
+        if not tokensById:
+            logger.debug(f"No changes in batch of {len(tokens)} tokens since last persist, skipping")
+            return
+        tokenIds = list(tokensById)
+        # One clock read for the whole batch; every row shares the same instant
+        currentTime = datetime.now(pytz.UTC)
+
+        try:
+            with self.conn_manager.transaction() as cursor:
+                # Rows here are only read internally; plain tuples skip building sqlite3.Row objects
+                cursor.row_factory = None
+
+                # Classify new vs existing in one pass per chunk
+                existingStates = {}
+                for start in range(0, len(tokenIds), IN_CLAUSE_CHUNK_SIZE):
+                    chunk = tokenIds[start:start + IN_CLAUSE_CHUNK_SIZE]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        SELECT 
+                            i.tokenid as info_tokenid,
+                            s.id as state_exists
+                        FROM pumpfuninfo i
+                        LEFT JOIN pumpfunstates s ON i.tokenid = s.tokenid
+                        WHERE i.tokenid IN ({placeholders})
+                    ''', chunk)
+                    for tokenId, stateId in cursor.fetchall():
+                        existingStates[tokenId] = stateId
+
+                newTokens = [token for tokenId, token in tokensById.items() if tokenId not in existingStates]
+                if newTokens:
+                    self._insertNewRecordsBatch(cursor, newTokens, currentTime)
+                inSyncTokens = list(newTokens)
+
+                existingTokens = [token for tokenId, token in tokensById.items() if tokenId in existingStates]
+                if existingTokens:
+                    inSyncTokens.extend(self._updateExistingRecordsBatch(cursor, existingTokens, existingStates, currentTime))
+
+                self.analyzeIfLarge(cursor, len(tokenIds), 'pumpfuninfo', 'pumpfunstates', 'pumpfunhistory')
+        except Exception as e:
+            logger.error(f"Failed to process batch of {len(tokenIds)} tokens: {str(e)}")
+            raise
+
+        for token in inSyncTokens:
+            self._persistedMetrics[token.tokenid] = self._changeParams(token)
+
+    def _insertNewRecordsBatch(self, cursor, tokens: List[PumpFunToken], currentTime: datetime) -> None:
+        """Insert info and state records for all new tokens with one executemany each"""
+        timestamp = localTimestamp(currentTime)
+
+        cursor.executemany(INSERT_INFO_SQL, [self._infoParams(token, timestamp) for token in tokens])
+        cursor.executemany(UPSERT_STATE_SQL, [self._stateParams(token, timestamp, timestamp) for token in tokens])
+
+        logger.info(f"Inserted {len(tokens)} new tokens")
+
+    def _updateExistingRecordsBatch(self, cursor, tokens: List[PumpFunToken], existingStates: Dict[str, Optional[int]],
+                                    currentTime: datetime) -> List[PumpFunToken]:
+        """
+        Archive and update every existing token that passes the same checks as _updateExistingRecords
         
-        if not result:
-            # New token - insert both records
-            self._insertNewRecords(cursor, token)
-        else:
-            # Existing token - archive and update
-            if not result['state_exists']:
+        Returns:
+            Tokens whose stored state now matches their key metrics (updated or unchanged)
+        """
+        timestamp = sqliteTimestamp(currentTime)
+        inSyncTokens = []
+
+        for token in tokens:
+            if not existingStates[token.tokenid]:
                 logger.error(f"Inconsistent state: Token {token.tokenid} exists in info but not in state table")
-                return
-            
-            self._updateExistingRecords(cursor, token, result)
+                continue
+            if not self._isRecentlySeen(token, currentTime):
+                continue
+            inSyncTokens.append(token)
+
+        # One change-check statement per chunk instead of one guarded snapshot per token
+        changedIds = set()
+        for start in range(0, len(inSyncTokens), CHANGE_CHECK_CHUNK_SIZE):
+            chunk = inSyncTokens[start:start + CHANGE_CHECK_CHUNK_SIZE]
+            cursor.execute(changedStatesSql(len(chunk)),
+                           [param for token in chunk for param in (token.tokenid,) + self._changeParams(token)])
+            changedIds.update(row[0] for row in cursor.fetchall())
+
+        changedTokens = [token for token in inSyncTokens if token.tokenid in changedIds]
+        logger.debug(f"{len(changedTokens)} of {len(inSyncTokens)} existing tokens changed")
+        if not changedTokens:
+            return inSyncTokens
 
-    def _insertNewRecords(self, cursor, token: PumpFunToken) -> None:
-        """Insert new token records in both tables"""
-        currentTime = datetime.now()
+        # Snapshot before the upsert (RETURNING would only see post-update values)
+        cursor.executemany(SNAPSHOT_CHANGED_STATE_SQL,
+                           [(timestamp, token.tokenid) + self._changeParams(token) for token in changedTokens])
+        cursor.executemany(UPSERT_STATE_SQL, [self._stateParams(token, timestamp, timestamp) for token in changedTokens])
+        cursor.executemany(BUMP_INFO_COUNT_SQL, [(timestamp, token.tokenid) for token in changedTokens])
+
+        logger.info(f"Updated {len(changedTokens)} tokens and archived their previous state")
+        return inSyncTokens
+
+    def _handleTokenData(self, cursor, token: PumpFunToken) -> bool:
+        """Handle token data insertion or update; returns True if the stored state now matches the token"""
+        currentTime = datetime.now(pytz.UTC)
+        # Insert-first: a new token costs one statement; only existing tokens fall through
+        if self._insertNewRecords(cursor, token, currentTime):
+            return True
+        return self._updateExistingRecords(cursor, token, currentTime)
+
+    def _insertNewRecords(self, cursor, token: PumpFunToken, currentTime: datetime) -> bool:
+        """Insert new token records in both tables; returns False if the token already exists"""
+        timestamp = localTimestamp(currentTime)
         
-        # Insert info record
-        cursor.execute('''
-            INSERT INTO pumpfuninfo (
-                tokenid, name, tokenname, chain, tokendecimals,
-                circulatingsupply, tokenage, twitterlink, telegramlink,
-                websitelink, firstseenat, lastupdatedat, count
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        ''', (
-            token.tokenid, token.name, token.tokenname, token.chain,
-            token.tokendecimals, token.circulatingsupply, token.tokenage,
-            token.twitterlink, token.telegramlink, token.websitelink,
-            currentTime, currentTime
-        ))
+        # Insert info record, unless the token is already known
+        cursor.execute(INSERT_INFO_IF_NEW_SQL, self._infoParams(token, timestamp))
+        if not cursor.fetchall():
+            return False
         
         # Insert state record
-        cursor.execute('''
-            INSERT INTO pumpfunstates (
-                tokenid, price, marketcap, liquidity, volume24h,
-                buysolqty, occurrencecount, percentilerankpeats,
-                percentileranksol, dexstatus, change1hpct,
-                createdat, lastupdatedat
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            token.tokenid, str(token.price), str(token.marketcap),
-            str(token.liquidity), str(token.volume24h), token.buysolqty,
-            token.occurrencecount, token.percentilerankpeats,
-            token.percentileranksol, token.dexstatus,
-            str(token.change1hpct), currentTime, currentTime
-        ))
+        cursor.execute(UPSERT_STATE_SQL, self._stateParams(token, timestamp, timestamp))
         
         logger.info(f"Inserted new token {token.tokenid}")
+        return True
 
-    def _updateExistingRecords(self, cursor, token: PumpFunToken, currentState: Dict) -> None:
+    def _updateExistingRecords(self, cursor, token: PumpFunToken, currentTime: datetime) -> bool:
         """
         Archive current state and update records ONLY if:
         1. The token was seen within the last 10 minutes (timeago ≤ 10 minutes), AND
@@ -226,103 +484,85 @@ class PumpFunHandler(BaseSQLiteHandler):
         
         If the token was seen more than 10 minutes ago, skip the update regardless of metric changes.
         
-        Key metrics monitored for changes:
+        Returns True if the stored state matches the token afterwards (updated or unchanged).
+        
+        Key metrics monitored for changes (compared in SQL, see _STATE_CHANGED_PREDICATE):
         - buysolqty: Number of SOL buy transactions
         - occurrencecount: Number of times token detected
         - percentilerankpeats: Ranking based on occurrences
         - percentileranksol: Ranking based on SOL buys
         """
-        currentTime = datetime.now(pytz.UTC)
+        timestamp = sqliteTimestamp(currentTime)
         
-        # PRIMARY CONDITION: Check if token was seen within the last 10 minutes using timeago field
-        if hasattr(token, 'timeago') and token.timeago is not None:
-            # Ensure timeago is timezone-aware (UTC)
-            tokenTimeago = token.timeago
-            if tokenTimeago.tzinfo is None:
-                tokenTimeago = pytz.UTC.localize(tokenTimeago)
-            
-            timeDifference = (currentTime - tokenTimeago).total_seconds() / 60  # Convert to minutes
-            
-            if timeDifference > 20:
-                logger.info(f"Token {token.tokenid} was seen {timeDifference:.2f} minutes ago (UTC), outside 10-minute threshold, skipping update")
-                return  # Skip update entirely if token was seen more than 10 minutes ago
-                
-            logger.info(f"Token {token.tokenid} was seen {timeDifference:.2f} minutes ago (UTC), within 10-minute threshold, checking for changes")
-        else:
-            # If timeago is None, skip update
-            logger.info(f"Token {token.tokenid} has no timeago value, skipping update")
-            return
-        
-        # SECONDARY CONDITION: Check if any key metrics have changed
-        shouldUpdate = False
-        metricsToCompare = [
-            ('buysolqty', token.buysolqty, currentState['buysolqty']),
-            ('occurrencecount', token.occurrencecount, currentState['occurrencecount']),
-            ('percentilerankpeats', token.percentilerankpeats, currentState['percentilerankpeats']),
-            ('percentileranksol', token.percentileranksol, currentState['percentileranksol'])
-        ]
-        
-        # Compare metrics and log changes
-        changedMetrics = []
-        for metricName, newValue, oldValue in metricsToCompare:
-            if newValue != oldValue:
-                shouldUpdate = True
-                changedMetrics.append(f"{metricName}: {oldValue} -> {newValue}")
+        if not self._isRecentlySeen(token, currentTime):
+            return False
         
-        if not shouldUpdate:
+        # 1. Archive current state, only if a key metric changed (the comparison runs in SQLite)
+        cursor.execute(SNAPSHOT_CHANGED_STATE_SQL, (timestamp, token.tokenid) + self._changeParams(token))
+        if cursor.rowcount == 0:
             logger.info(f"No changes detected for token {token.tokenid}, skipping update")
-            return
+            return True
             
-        logger.info(f"Changes detected for token {token.tokenid}: {', '.join(changedMetrics)}")
-        
-        # 1. Archive current state since we're going to update
-        cursor.execute('''
-            INSERT INTO pumpfunhistory (
-                tokenid, snapshotat, price, marketcap, liquidity,
-                volume24h, buysolqty, occurrencecount, percentilerankpeats,
-                percentileranksol, dexstatus, change1hpct, createdat
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            currentState['tokenid'], currentState['lastupdatedat'],
-            currentState['price'], currentState['marketcap'],
-            currentState['liquidity'], currentState['volume24h'],
-            currentState['buysolqty'], currentState['occurrencecount'],
-            currentState['percentilerankpeats'], currentState['percentileranksol'],
-            currentState['dexstatus'], currentState['change1hpct'], currentTime
-        ))
+        logger.info(f"Changes detected for token {token.tokenid}")
         
-        # 2. Update state table
-        cursor.execute('''
-            UPDATE pumpfunstates SET
-                price = ?,
-                marketcap = ?,
-                liquidity = ?,
-                volume24h = ?,
-                buysolqty = ?,
-                occurrencecount = ?,
-                percentilerankpeats = ?,
-                percentileranksol = ?,
-                dexstatus = ?,
-                change1hpct = ?,
-                lastupdatedat = ?
-            WHERE tokenid = ?
-        ''', (
-            str(token.price), str(token.marketcap), str(token.liquidity),
-            str(token.volume24h), token.buysolqty, token.occurrencecount,
-            token.percentilerankpeats, token.percentileranksol,
-            token.dexstatus, str(token.change1hpct), currentTime,
-            token.tokenid
-        ))
+        # 2. Update state table (same predicate guards the DO UPDATE)
+        cursor.execute(UPSERT_STATE_SQL, self._stateParams(token, timestamp, timestamp))
         
         # 3. Update info table
-        cursor.execute('''
-            UPDATE pumpfuninfo SET
-                count = count + 1,
-                lastupdatedat = ?
-            WHERE tokenid = ?
-        ''', (currentTime, token.tokenid))
+        cursor.execute(BUMP_INFO_COUNT_SQL, (timestamp, token.tokenid))
         
         logger.info(f"Updated token {token.tokenid} and archived previous state")
+        return True
+
+    @staticmethod
+    def _infoParams(token: PumpFunToken, currentTime: str) -> tuple:
+        """Bind parameters for INSERT_INFO_SQL"""
+        return (
+            token.tokenid, token.name, token.tokenname, token.chain,
+            token.tokendecimals, token.circulatingsupply, token.tokenage,
+            token.twitterlink, token.telegramlink, token.websitelink,
+            currentTime, currentTime
+        )
+
+    @staticmethod
+    def _stateParams(token: PumpFunToken, createdAt: str, updatedAt: str) -> tuple:
+        """Bind parameters for UPSERT_STATE_SQL"""
+        return (
+            token.tokenid, str(token.price), str(token.marketcap),
+            str(token.liquidity), str(token.volume24h), token.buysolqty,
+            token.occurrencecount, token.percentilerankpeats,
+            token.percentileranksol, token.dexstatus,
+            str(token.change1hpct), createdAt, updatedAt,
+            toScaledInt(token.price, PRICE_SCALE), toScaledInt(token.marketcap, USD_SCALE),
+            toScaledInt(token.liquidity, USD_SCALE), toScaledInt(token.volume24h, USD_SCALE),
+            toScaledInt(token.change1hpct, CHANGE_PCT_SCALE)
+        )
+
+    @staticmethod
+    def _changeParams(token: PumpFunToken) -> tuple:
+        """Bind parameters for _STATE_CHANGED_PREDICATE"""
+        return (token.buysolqty, token.occurrencecount, token.percentilerankpeats, token.percentileranksol)
+
+    def _isRecentlySeen(self, token: PumpFunToken, currentTime: datetime) -> bool:
+        """PRIMARY CONDITION: token was seen within the update window according to its timeago field"""
+        if not hasattr(token, 'timeago') or token.timeago is None:
+            # If timeago is None, skip update
+            logger.debug(f"Token {token.tokenid} has no timeago value, skipping update")
+            return False
+        
+        # Ensure timeago is timezone-aware (UTC)
+        tokenTimeago = token.timeago
+        if tokenTimeago.tzinfo is None:
+            tokenTimeago = pytz.UTC.localize(tokenTimeago)
+        
+        timeDifference = (currentTime - tokenTimeago).total_seconds() / 60  # Convert to minutes
+        
+        if timeDifference > 20:
+            logger.debug(f"Token {token.tokenid} was seen {timeDifference:.2f} minutes ago (UTC), outside 10-minute threshold, skipping update")
+            return False  # Skip update entirely if token was seen more than 10 minutes ago
+            
+        logger.debug(f"Token {token.tokenid} was seen {timeDifference:.2f} minutes ago (UTC), within 10-minute threshold, checking for changes")
+        return True
 
     def getTokenHistory(self, tokenId: str, startTime: datetime, endTime: datetime) -> List[Dict]:
         """Get token history for backtesting"""
@@ -1,11 +1,61 @@
 from database.operations.base_handler import BaseSQLiteHandler
 from typing import Dict, Optional, List, Tuple
 import sqlite3
-from datetime import datetime
+import time
+from itertools import chain
 from logs.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Rows per executemany call when storing a large movements batch
+MOVEMENTS_BATCH_CHUNK_SIZE = 10_000
+
+# Movement indexes created by earlier versions of SmartMoneyPNLReportHandler; replaced by
+# idx_smm_wallet_date_token and idx_smm_cover, so existing databases drop them on startup
+SUPERSEDED_MOVEMENT_INDEXES = (
+    'idx_smartmoneymovements_wallet_date',
+    'idx_smartmoneymovements_date_wallet_token',
+)
+
+UPSERT_LAST_FETCHED_SQL = '''
+    INSERT INTO smartmoneymovementsbatch 
+    (walletaddress, lastfetchedat, updatedat)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(walletaddress) DO UPDATE SET
+        lastfetchedat = excluded.lastfetchedat,
+        updatedat = CURRENT_TIMESTAMP
+'''
+
+_MOVEMENT_INSERT_SQL = '''
+    INSERT INTO smartmoneymovements 
+    (walletaddress, tokenaddress, buytokenchange, selltokenchange,
+     buyusdchange, sellusdchange, buytokenname, selltokenname, date)
+    VALUES {values}
+'''
+
+_MOVEMENT_ROW_PLACEHOLDERS = '(?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+_MOVEMENT_CONFLICT_SQL = '''
+    ON CONFLICT(walletaddress, tokenaddress, date) DO UPDATE SET
+        buytokenchange = buytokenchange + excluded.buytokenchange,
+        selltokenchange = selltokenchange + excluded.selltokenchange,
+        buyusdchange = buyusdchange + excluded.buyusdchange,
+        sellusdchange = sellusdchange + excluded.sellusdchange,
+        buytokenname = COALESCE(excluded.buytokenname, buytokenname),
+        selltokenname = COALESCE(excluded.selltokenname, selltokenname)
+'''
+
+UPSERT_MOVEMENT_SQL = _MOVEMENT_INSERT_SQL.format(values=_MOVEMENT_ROW_PLACEHOLDERS) + _MOVEMENT_CONFLICT_SQL
+
+# Batches up to this size go out as one multi-VALUES statement (9 params/row stays
+# well under SQLite's 999 bound-variable limit)
+MULTI_VALUES_MAX_ROWS = 50
+
+def multiValuesMovementSql(rowCount: int) -> str:
+    """Build the movements upsert with rowCount VALUES groups"""
+    values = ', '.join([_MOVEMENT_ROW_PLACEHOLDERS] * rowCount)
+    return _MOVEMENT_INSERT_SQL.format(values=values) + _MOVEMENT_CONFLICT_SQL
+
 class SmartMoneyMovementsHandler(BaseSQLiteHandler):
     """
     Handler for smart money movements data.
@@ -48,6 +98,25 @@ class SmartMoneyMovementsHandler(BaseSQLiteHandler):
                 )
             ''')
 
+            # Per-wallet date-range lookups; the UNIQUE(walletaddress, tokenaddress, date) index
+            # puts tokenaddress before date, so it cannot serve the range on its own.
+            # Trailing tokenaddress lets the excluded-token NOT IN be checked from the index.
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_smm_wallet_date_token 
+                ON smartmoneymovements(walletaddress, date, tokenaddress)
+            ''')
+            # Covering index for the PNL reports' date-range aggregations: the excluded-token
+            # check, grouping keys and summed columns are all read from the index
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_smm_cover 
+                ON smartmoneymovements(date, tokenaddress, walletaddress,
+                                       buytokenchange, selltokenchange, buyusdchange, sellusdchange)
+            ''')
+            for index in SUPERSEDED_MOVEMENT_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
+            cursor.execute('PRAGMA optimize')
+
     def storeMovementsBatch(self, batch_data: List[Tuple], cursor: Optional[sqlite3.Cursor] = None) -> bool:
         """
         Store multiple movement records in a single batch operation
@@ -67,19 +136,17 @@ class SmartMoneyMovementsHandler(BaseSQLiteHandler):
             
         try:
             if cursor:
-                cursor.executemany('''
-                    INSERT INTO smartmoneymovements 
-                    (walletaddress, tokenaddress, buytokenchange, selltokenchange,
-                     buyusdchange, sellusdchange, buytokenname, selltokenname, date)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(walletaddress, tokenaddress, date) DO UPDATE SET
-                        buytokenchange = buytokenchange + excluded.buytokenchange,
-                        selltokenchange = selltokenchange + excluded.selltokenchange,
-                        buyusdchange = buyusdchange + excluded.buyusdchange,
-                        sellusdchange = sellusdchange + excluded.sellusdchange,
-                        buytokenname = CASE WHEN excluded.buytokenname IS NOT NULL THEN excluded.buytokenname ELSE buytokenname END,
-                        selltokenname = CASE WHEN excluded.selltokenname IS NOT NULL THEN excluded.selltokenname ELSE selltokenname END
-                ''', batch_data)
+                if len(batch_data) <= MULTI_VALUES_MAX_ROWS:
+                    # Small incremental batches: one statement instead of an executemany loop
+                    cursor.execute(multiValuesMovementSql(len(batch_data)),
+                                   list(chain.from_iterable(batch_data)))
+                    logger.info(f"Successfully stored {len(batch_data)} movement records")
+                    return True
+
+                # Large batches are written in fixed-size slices inside the same transaction
+                for start in range(0, len(batch_data), MOVEMENTS_BATCH_CHUNK_SIZE):
+                    cursor.executemany(UPSERT_MOVEMENT_SQL, batch_data[start:start + MOVEMENTS_BATCH_CHUNK_SIZE])
+                self.analyzeIfLarge(cursor, len(batch_data), 'smartmoneymovements')
                 logger.info(f"Successfully stored {len(batch_data)} movement records")
                 return True
             else:
@@ -102,17 +169,10 @@ class SmartMoneyMovementsHandler(BaseSQLiteHandler):
             bool: Success status
         """
         try:
-            current_time = int(datetime.now().timestamp())
+            current_time = int(time.time())
             
             if cursor:
-                cursor.execute('''
-                    INSERT INTO smartmoneymovementsbatch 
-                    (walletaddress, lastfetchedat, updatedat)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                    ON CONFLICT(walletaddress) DO UPDATE SET
-                        lastfetchedat = excluded.lastfetchedat,
-                        updatedat = CURRENT_TIMESTAMP
-                ''', (wallet_address, current_time))
+                cursor.execute(UPSERT_LAST_FETCHED_SQL, (wallet_address, current_time))
                 return cursor.rowcount > 0
             else:
                 with self.conn_manager.transaction() as cur:
@@ -133,13 +193,14 @@ class SmartMoneyMovementsHandler(BaseSQLiteHandler):
         """
         try:
             with self.conn_manager.transaction() as cursor:
+                cursor.row_factory = None  # single scalar, no need for sqlite3.Row
                 cursor.execute("""
                     SELECT lastfetchedat 
                     FROM smartmoneymovementsbatch
                     WHERE walletaddress = ?
                 """, (wallet_address,))
                 row = cursor.fetchone()
-                return row['lastfetchedat'] if row and row['lastfetchedat'] else None
+                return row[0] if row and row[0] else None
         except Exception as e:
             logger.error(f"Failed to get last fetch time: {str(e)}")
             return None
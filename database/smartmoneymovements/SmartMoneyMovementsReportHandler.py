@@ -1,9 +1,15 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from database.operations.base_handler import BaseSQLiteHandler
 from logs.logger import get_logger
 import sqlite3
+import numpy as np
+import math
+from array import array
 from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from actions.DexscrennerAction import DexScreenerAction
+from cache.cache_manager import SimpleTTLCache
 
 logger = get_logger(__name__)
 
@@ -15,7 +21,100 @@ EXCLUDED_TOKEN_IDS = [
     "So11111111111111111111111111111111111111112",  # Wrapped SOL
     "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"  # USDC
 ]
-SQL_EXCLUDED_TOKENS = "(" + ",".join([f"'{token}'" for token in EXCLUDED_TOKEN_IDS]) + ")"
+# Bound as parameters (append EXCLUDED_TOKEN_IDS to the query params) rather than inlined as literals,
+# the same way SmartMoneyPNLReportHandler excludes them
+SQL_EXCLUDED_TOKENS = "(" + ",".join("?" * len(EXCLUDED_TOKEN_IDS)) + ")"
+
+# Report sort fields that don't depend on current prices, mapped to their SQL column
+SQL_SORT_COLUMNS = {
+    "tokenaddress": "tokenaddress",
+    "tokenname": "tokenname",
+    "totalInvested": "total_invested",
+    "totalTakenOut": "total_taken_out",
+    "remainingCoins": "remaining_coins",
+    "realizedPnl": "realized_pnl"
+}
+
+# Queries are built once at import time so every call binds parameters into identical
+# statement text and reuses the connection's prepared-statement cache
+# Prices persisted in token_prices_cache ride along via the join; stale or missing ones are
+# refreshed from DexScreener by the caller
+REPORT_SQL = f"""
+SELECT m.*, p.price, p.updatedat
+FROM (
+SELECT 
+    tokenaddress,
+    COALESCE(MAX(buytokenname), MAX(selltokenname), 'Unknown') AS tokenname,
+    TOTAL(buyusdchange) AS total_invested,
+    TOTAL(sellusdchange) AS total_taken_out,
+    TOTAL(buytokenchange) - TOTAL(selltokenchange) AS remaining_coins,
+    TOTAL(sellusdchange) - TOTAL(buyusdchange) AS realized_pnl
+FROM smartmoneymovements
+WHERE walletaddress = ?
+AND date >= ?
+AND date <= ?
+AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
+GROUP BY tokenaddress
+) m
+LEFT JOIN token_prices_cache p USING (tokenaddress)
+"""
+
+UPSERT_TOKEN_PRICE_SQL = """
+INSERT INTO token_prices_cache (tokenaddress, price, updatedat)
+VALUES (?, ?, ?)
+ON CONFLICT(tokenaddress) DO UPDATE SET
+    price = excluded.price,
+    updatedat = excluded.updatedat
+"""
+
+# (sort field, direction) -> report query ordered in SQL
+REPORT_SQL_BY_SORT = {
+    (sort_field, direction): f"{REPORT_SQL}ORDER BY {column} {direction}, tokenaddress\n"
+    for sort_field, column in SQL_SORT_COLUMNS.items()
+    for direction in ("ASC", "DESC")
+}
+
+# Query to get all daily movements of one token directly
+TOKEN_MOVEMENTS_SQL = f"""
+SELECT 
+    date,
+    tokenaddress,
+    COALESCE(buytokenname, selltokenname, 'Unknown') AS tokenname,
+    CAST(COALESCE(buytokenchange, 0) AS REAL) AS buytokenchange,
+    CAST(COALESCE(selltokenchange, 0) AS REAL) AS selltokenchange,
+    CAST(COALESCE(buyusdchange, 0) AS REAL) AS buyusdchange,
+    CAST(COALESCE(sellusdchange, 0) AS REAL) AS sellusdchange
+FROM smartmoneymovements
+WHERE walletaddress = ?
+AND tokenaddress = ?
+AND date >= ?
+AND date <= ?
+AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
+ORDER BY date DESC
+"""
+
+# DexScreener accepts up to 30 addresses per batch request; chunks are fetched in parallel
+PRICE_CHUNK_SIZE = 30
+PRICE_FETCH_WORKERS = 8
+
+# Prices are shared across report requests for a short window, keyed by (chain, token address)
+PRICE_CACHE_SIZE = 50_000
+PRICE_CACHE_TTL = 60
+PRICE_CHAIN = "solana"
+
+# Rows fetched per fetchmany() round-trip while streaming query results
+QUERY_FETCH_SIZE = 1000
+
+def isoDateRange(days: int) -> Tuple[str, str]:
+    """
+    Report window as ISO date strings, computed once per call and bound directly
+    (the date column holds 'YYYY-MM-DD' text) and reused for the period block.
+    
+    Returns:
+        (start_date, end_date) as 'YYYY-MM-DD'
+    """
+    end_date = datetime.now().date()
+    return (end_date - timedelta(days=days)).isoformat(), end_date.isoformat()
 
 class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
     """
@@ -23,6 +122,12 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
     Provides methods to query wallet movement data for reporting.
     """
     
+    # Process-wide so concurrent reports on overlapping tokens share one DexScreener lookup
+    _price_cache = SimpleTTLCache(maxsize=PRICE_CACHE_SIZE, ttl=PRICE_CACHE_TTL)
+    
+    # Handlers are created per request; the token_prices_cache table only needs creating once per process
+    _tablesReady = False
+    
     def __init__(self, conn_manager):
         """
         Initialize the handler with a connection manager.
@@ -32,33 +137,139 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
         """
         super().__init__(conn_manager)
         self.dex_screener = DexScreenerAction()
+        if not SmartMoneyMovementsReportHandler._tablesReady:
+            self._createTables()
+            SmartMoneyMovementsReportHandler._tablesReady = True
     
-    def execute_query(self, query: str, params: tuple = ()) -> List[tuple]:
+    def _createTables(self):
+        """Create the token_prices_cache table"""
+        with self.conn_manager.transaction() as cursor:
+            # Last known DexScreener price per token, shared across processes and restarts.
+            # There is no background poller: report requests write through what they fetch, so
+            # only prices DexScreener actually returned ever land here
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS token_prices_cache (
+                    tokenaddress TEXT PRIMARY KEY,
+                    price REAL,
+                    updatedat INTEGER  -- Store as UNIX timestamp
+                )
+            ''')
+    
+    def execute_query_iter(self, query: str, params: tuple = (), batch_size: int = QUERY_FETCH_SIZE) -> Iterator[tuple]:
         """
-        Execute a SQL query and return the results.
+        Execute a SQL query and stream the results in fetchmany() batches,
+        so callers build their output incrementally instead of from a full list.
         
         Args:
             query: SQL query to execute
             params: Query parameters
+            batch_size: Rows fetched per round-trip
             
-        Returns:
-            List of tuples containing the query results
+        Yields:
+            Result rows as tuples
         """
         try:
             with self.conn_manager.transaction() as cursor:
                 cursor.execute(query, params)
-                return cursor.fetchall()
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
         except sqlite3.Error as e:
             logger.error(f"Database error executing query: {str(e)}")
             logger.error(f"Query: {query}")
             logger.error(f"Params: {params}")
             raise
 
+    def execute_query(self, query: str, params: tuple = ()) -> List[tuple]:
+        """
+        Execute a SQL query and return the results.
+        
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+            
+        Returns:
+            List of tuples containing the query results
+        """
+        return list(self.execute_query_iter(query, params))
+
+    def _fetchTokenPrices(self, token_addresses: List[str]) -> Dict[str, float]:
+        """
+        Fetch current prices in 30-address chunks on a thread pool so HTTP round-trips overlap.
+        Prices seen in the last PRICE_CACHE_TTL seconds are served from _price_cache; fetched
+        prices are also written through to token_prices_cache. Tokens DexScreener returned no price
+        for (getBatchTokenPrices reports a failed chunk the same way) come back as 0 but are neither
+        cached nor persisted, so the next call asks again.
+        
+        Args:
+            token_addresses: Token addresses to price
+            
+        Returns:
+            Dictionary mapping token address to price (0 if DexScreener had no price)
+        """
+        token_prices = {}
+        misses = []
+        for token_address in token_addresses:
+            cached_price = self._price_cache.get((PRICE_CHAIN, token_address))
+            if cached_price is not None:
+                token_prices[token_address] = cached_price
+            else:
+                misses.append(token_address)
+        if not misses:
+            return token_prices
+        
+        fetched_prices = {}
+        unpriced = []
+        chunks = [misses[i:i + PRICE_CHUNK_SIZE] for i in range(0, len(misses), PRICE_CHUNK_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(PRICE_FETCH_WORKERS, len(chunks))) as executor:
+            futures = [executor.submit(self.dex_screener.getBatchTokenPrices, chunk, PRICE_CHAIN) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    # Convert TokenPrice objects to simple price values, straight into the result
+                    for token_id, token_price in future.result().items():
+                        if token_price is not None:
+                            fetched_prices[token_id] = token_price.price
+                        else:
+                            unpriced.append(token_id)
+                except Exception as e:
+                    logger.error(f"Error fetching token prices: {str(e)}")
+        
+        for token_address, price in fetched_prices.items():
+            self._price_cache[(PRICE_CHAIN, token_address)] = price
+        if fetched_prices:
+            self._storeTokenPrices(fetched_prices)
+        token_prices.update(fetched_prices)
+        token_prices.update(dict.fromkeys(unpriced, 0))
+        return token_prices
+
+    def _storeTokenPrices(self, token_prices: Dict[str, float]) -> None:
+        """
+        Persist freshly fetched prices to token_prices_cache; failures only cost a future refetch.
+        Tokens without a price (failed or empty lookups) are never stored, since the report
+        query would otherwise trust them for PRICE_CACHE_TTL seconds.
+        """
+        updated_at = int(time.time())
+        rows = [
+            (token_address, price, updated_at) for token_address, price in token_prices.items()
+            if price is not None
+        ]
+        if not rows:
+            return
+        try:
+            with self.conn_manager.transaction() as cursor:
+                cursor.executemany(UPSERT_TOKEN_PRICE_SQL, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store token prices: {str(e)}")
+
     def getLastNDaysInvestmentReport(self, 
                                   wallet_address: str,
                                   days: int = 30,
                                   sort_by: str = "totalPnl",
-                                  sort_order: str = "desc") -> Dict[str, Any]:
+                                  sort_order: str = "desc",
+                                  limit: Optional[int] = None,
+                                  offset: int = 0) -> Dict[str, Any]:
         """
         Get investment report for a wallet's token movements within specified time period.
         
@@ -67,10 +278,15 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
             days: Number of days to look back
             sort_by: Field to sort by
             sort_order: Sort order (asc or desc)
+            limit: Maximum number of tokens to return (None for all)
+            offset: Number of sorted tokens to skip
             
         Returns:
             Dictionary with report data including summary and token details
         """
+        # Calculate date range
+        start_date, end_date = isoDateRange(days)
+        
         try:
             # Validate sort parameters
             validSortFields = ["tokenaddress", "tokenname", "totalInvested", 
@@ -83,170 +299,162 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
             if sort_order.lower() not in ["asc", "desc"]:
                 sort_order = "desc"
             
-            # Calculate date range
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=days)
+            # Arithmetic and (price-independent) ordering happen in SQL; Python only merges prices
+            sqlSorted = sort_by in SQL_SORT_COLUMNS
+            query = REPORT_SQL_BY_SORT.get((sort_by, sort_order.upper()), REPORT_SQL)
             
-            # Query to get token movements for the wallet within date range
-            query = f"""
-            SELECT 
-                tokenaddress,
-                CASE 
-                    WHEN COUNT(buytokenname) > 0 AND MAX(buytokenname) IS NOT NULL THEN MAX(buytokenname)
-                    WHEN COUNT(selltokenname) > 0 AND MAX(selltokenname) IS NOT NULL THEN MAX(selltokenname)
-                    ELSE 'Unknown'
-                END AS tokenname,
-                SUM(buytokenchange) AS total_buy_token,
-                SUM(selltokenchange) AS total_sell_token,
-                SUM(buyusdchange) AS total_buy_usd,
-                SUM(sellusdchange) AS total_sell_usd
-            FROM smartmoneymovements
-            WHERE walletaddress = ?
-            AND date >= ?
-            AND date <= ?
-            AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
-            GROUP BY tokenaddress
-            """
+            params = (wallet_address, start_date, end_date, *EXCLUDED_TOKEN_IDS)
             
-            params = (wallet_address, start_date, end_date)
-            results = self.execute_query(query, params)
+            # Columns are collected side by side (SoA) so derived values are computed as arrays
+            # (numeric columns as unboxed C doubles, viewed by NumPy without a copy)
+            addresses = []
+            names = []
+            invested = array('d')
+            taken_out = array('d')
+            remaining = array('d')
+            realized = array('d')
+            stored_prices = {}
+            fresh_after = time.time() - PRICE_CACHE_TTL
             
-            # Process results
-            tokens = []
-            token_addresses = []
+            for (token_address, token_name, total_invested, total_taken_out, remaining_coins, realized_pnl,
+                 stored_price, stored_at) in self.execute_query_iter(query, params):
+                if stored_at is not None and stored_at >= fresh_after:
+                    stored_prices[token_address] = stored_price
+                addresses.append(token_address)
+                names.append(token_name or "Unknown")
+                invested.append(total_invested)
+                taken_out.append(total_taken_out)
+                remaining.append(remaining_coins)
+                realized.append(realized_pnl)
             
-            for row in results:
-                token_address = row[0]
-                token_name = row[1] or "Unknown"
-                total_buy_token = float(row[2]) if row[2] is not None else 0
-                total_sell_token = float(row[3]) if row[3] is not None else 0
-                total_buy_usd = float(row[4]) if row[4] is not None else 0
-                total_sell_usd = float(row[5]) if row[5] is not None else 0
-                
-                remaining_coins = total_buy_token - total_sell_token
-                realized_pnl = total_sell_usd - total_buy_usd
-                
-                token = {
-                    "tokenAddress": token_address,
-                    "tokenName": token_name,
-                    "totalInvested": total_buy_usd,
-                    "totalTakenOut": total_sell_usd,
-                    "remainingCoins": remaining_coins,
-                    "currentPrice": 0,  # Will be updated later
-                    "remainingValue": 0,  # Will be calculated
-                    "realizedPnl": realized_pnl,
-                    "totalPnl": 0,  # Will be calculated
-                    "pnlPercentage": 0  # Will be calculated
-                }
-                
-                tokens.append(token)
-                
-                # Only fetch prices for tokens with remaining coins
-                if remaining_coins > 0:
-                    token_addresses.append(token_address)
+            # Nothing in the window: skip the price fetch, arithmetic and sort
+            if not addresses:
+                return self._empty_report(wallet_address, days, start_date, end_date)
             
-            # Get current prices for tokens with remaining coins
-            token_prices = {}
-            if token_addresses:
-                try:
-                    token_price_data = self.dex_screener.getBatchTokenPrices(token_addresses, "solana")
-                    
-                    # Convert TokenPrice objects to simple price values
-                    for token_id, token_price in token_price_data.items():
-                        if token_price is not None:
-                            token_prices[token_id] = token_price.price
-                        else:
-                            token_prices[token_id] = 0
-                except Exception as e:
-                    logger.error(f"Error fetching token prices: {str(e)}")
+            invested = np.frombuffer(invested, dtype=np.float64)
+            taken_out = np.frombuffer(taken_out, dtype=np.float64)
+            remaining = np.frombuffer(remaining, dtype=np.float64)
+            realized = np.frombuffer(realized, dtype=np.float64)
+            
+            # Get current prices, only for tokens with remaining coins; fresh stored prices skip DexScreener
+            # Prices are written straight into the array; no merged price dict is built
+            held = np.flatnonzero(remaining > 0).tolist()
+            fetched_prices = self._fetchTokenPrices([addresses[i] for i in held if addresses[i] not in stored_prices])
+            prices = np.zeros(len(addresses), dtype=np.float64)
+            for i in held:
+                address = addresses[i]
+                prices[i] = stored_prices[address] if address in stored_prices else fetched_prices.get(address, 0)
             
             # Calculate remaining value, total PNL, and PNL percentage
+            remaining_value = remaining * prices
+            total_pnl = realized + remaining_value
+            pnl_percentage = np.divide(total_pnl * 100, invested, out=np.zeros_like(total_pnl), where=invested > 0)
+            
+            # Summary totals use fsum so large wallets don't accumulate rounding error
+            total_invested_sum = math.fsum(invested)
+            total_pnl_sum = math.fsum(total_pnl)
             wallet_summary = {
                 "walletAddress": wallet_address,
-                "totalInvested": 0,
-                "totalTakenOut": 0,
-                "totalRemainingValue": 0,
-                "totalRealizedPnl": 0,
-                "totalPnl": 0,
-                "totalPnlPercentage": 0
+                "totalInvested": total_invested_sum,
+                "totalTakenOut": math.fsum(taken_out),
+                "totalRemainingValue": math.fsum(remaining_value),
+                "totalRealizedPnl": math.fsum(realized),
+                "totalPnl": total_pnl_sum,
+                # Overall PNL percentage
+                "totalPnlPercentage": (total_pnl_sum / total_invested_sum) * 100 if total_invested_sum > 0 else 0
             }
             
-            for token in tokens:
-                token_address = token["tokenAddress"]
-                remaining_coins = token["remainingCoins"]
-                
-                # Get current price
-                current_price = token_prices.get(token_address, 0)
-                token["currentPrice"] = current_price
-                
-                # Calculate remaining value
-                remaining_value = remaining_coins * current_price
-                token["remainingValue"] = remaining_value
-                
-                # Calculate total PNL
-                total_pnl = token["realizedPnl"] + remaining_value
-                token["totalPnl"] = total_pnl
-                
-                # Calculate PNL percentage
-                if token["totalInvested"] > 0:
-                    token["pnlPercentage"] = (total_pnl / token["totalInvested"]) * 100
-                
-                # Update wallet summary
-                wallet_summary["totalInvested"] += token["totalInvested"]
-                wallet_summary["totalTakenOut"] += token["totalTakenOut"]
-                wallet_summary["totalRemainingValue"] += remaining_value
-                wallet_summary["totalRealizedPnl"] += token["realizedPnl"]
-                wallet_summary["totalPnl"] += total_pnl
+            # Price-dependent fields can only be sorted once prices are merged (stable, like sorted())
+            if sqlSorted:
+                order = range(len(addresses))
+            else:
+                sort_key = total_pnl if sort_by == "totalPnl" else pnl_percentage
+                order = np.argsort(-sort_key if sort_order.lower() == "desc" else sort_key, kind="stable").tolist()
             
-            # Calculate overall PNL percentage
-            if wallet_summary["totalInvested"] > 0:
-                wallet_summary["totalPnlPercentage"] = (wallet_summary["totalPnl"] / wallet_summary["totalInvested"]) * 100
+            # Paginate before materializing dicts; the wallet summary above still covers every token
+            offset = max(offset, 0)
+            order = order[offset:offset + max(limit, 0) if limit is not None else None]
             
-            # Sort tokens based on requested field
-            sort_field_map = {
-                "tokenaddress": "tokenAddress",
-                "tokenname": "tokenName",
-                "totalInvested": "totalInvested",
-                "totalTakenOut": "totalTakenOut",
-                "remainingCoins": "remainingCoins",
-                "realizedPnl": "realizedPnl",
-                "totalPnl": "totalPnl",
-                "pnlPercentage": "pnlPercentage"
-            }
+            # Back to plain Python floats for the JSON response
+            invested = invested.tolist()
+            taken_out = taken_out.tolist()
+            remaining = remaining.tolist()
+            prices = prices.tolist()
+            remaining_value = remaining_value.tolist()
+            realized = realized.tolist()
+            total_pnl = total_pnl.tolist()
+            pnl_percentage = pnl_percentage.tolist()
             
-            sort_field = sort_field_map.get(sort_by, "totalPnl")
-            tokens = sorted(tokens, key=lambda x: x[sort_field], reverse=(sort_order.lower() == "desc"))
+            tokens = [
+                {
+                    "tokenAddress": addresses[i],
+                    "tokenName": names[i],
+                    "totalInvested": invested[i],
+                    "totalTakenOut": taken_out[i],
+                    "remainingCoins": remaining[i],
+                    "currentPrice": prices[i],
+                    "remainingValue": remaining_value[i],
+                    "realizedPnl": realized[i],
+                    "totalPnl": total_pnl[i],
+                    "pnlPercentage": pnl_percentage[i]
+                }
+                for i in order
+            ]
             
-            return {
+            report = {
                 "wallet": wallet_summary,
                 "tokens": tokens,
                 "period": {
                     "days": days,
-                    "startDate": start_date.isoformat(),
-                    "endDate": end_date.isoformat()
+                    "startDate": start_date,
+                    "endDate": end_date
                 }
             }
+            if limit is not None or offset:
+                report["pagination"] = {
+                    "limit": limit,
+                    "offset": offset,
+                    "totalTokens": len(addresses)
+                }
+            return report
         
         except Exception as e:
             logger.error(f"Error generating wallet movement report: {str(e)}")
-            return {
-                "wallet": {
-                    "walletAddress": wallet_address,
-                    "totalInvested": 0,
-                    "totalTakenOut": 0,
-                    "totalRemainingValue": 0,
-                    "totalRealizedPnl": 0,
-                    "totalPnl": 0,
-                    "totalPnlPercentage": 0
-                },
-                "tokens": [],
-                "period": {
-                    "days": days,
-                    "startDate": start_date.isoformat() if 'start_date' in locals() else "",
-                    "endDate": datetime.now().date().isoformat()
-                },
-                "error": str(e)
-            } 
+            report = self._empty_report(wallet_address, days, start_date, end_date)
+            report["error"] = str(e)
+            return report
+
+    @staticmethod
+    def _empty_report(wallet_address: str, days: int, start_date: str, end_date: str) -> Dict[str, Any]:
+        """
+        Build the zero-valued investment report, used when a wallet has no movements or on error.
+        
+        Args:
+            wallet_address: Wallet address the report is for
+            days: Number of days looked back
+            start_date: Start of the window ('YYYY-MM-DD')
+            end_date: End of the window ('YYYY-MM-DD')
+            
+        Returns:
+            Report dictionary with an all-zero summary and no tokens
+        """
+        return {
+            "wallet": {
+                "walletAddress": wallet_address,
+                "totalInvested": 0,
+                "totalTakenOut": 0,
+                "totalRemainingValue": 0,
+                "totalRealizedPnl": 0,
+                "totalPnl": 0,
+                "totalPnlPercentage": 0
+            },
+            "tokens": [],
+            "period": {
+                "days": days,
+                "startDate": start_date,
+                "endDate": end_date
+            }
+        }
 
     def getTokenMovementsForWallet(self,
                                  wallet_address: str,
@@ -263,45 +471,18 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
         Returns:
             Dictionary with daily movement data
         """
+        # Calculate date range
+        start_date, end_date = isoDateRange(days)
+        
         try:
-            # Calculate date range
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=days)
-            
-            # Query to get all daily movements directly
-            query = f"""
-            SELECT 
-                date,
-                tokenaddress,
-                COALESCE(buytokenname, selltokenname, 'Unknown') AS tokenname,
-                buytokenchange,
-                selltokenchange,
-                buyusdchange,
-                sellusdchange
-            FROM smartmoneymovements
-            WHERE walletaddress = ?
-            AND tokenaddress = ?
-            AND date >= ?
-            AND date <= ?
-            AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
-            ORDER BY date DESC
-            """
+            params = (wallet_address, token_address, start_date, end_date, *EXCLUDED_TOKEN_IDS)
             
-            params = (wallet_address, token_address, start_date, end_date)
-            results = self.execute_query(query, params)
-            
-            # Process results
+            # Process results as they stream in
             movements = []
             
-            for row in results:
-                date_str = row[0]
-                token_address = row[1]
-                token_name = row[2]
-                buy_token_change = float(row[3]) if row[3] is not None else 0
-                sell_token_change = float(row[4]) if row[4] is not None else 0
-                buy_usd_change = float(row[5]) if row[5] is not None else 0
-                sell_usd_change = float(row[6]) if row[6] is not None else 0
-                
+            # NULL handling and float conversion are done in SQL, so rows unpack straight into the response
+            for (date_str, token_address, token_name, buy_token_change, sell_token_change,
+                 buy_usd_change, sell_usd_change) in self.execute_query_iter(TOKEN_MOVEMENTS_SQL, params):
                 movements.append({
                     "date": date_str,
                     "tokenAddress": token_address,
@@ -316,8 +497,8 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
                 "movements": movements,
                 "period": {
                     "days": days,
-                    "startDate": start_date.isoformat(),
-                    "endDate": end_date.isoformat()
+                    "startDate": start_date,
+                    "endDate": end_date
                 }
             }
             
@@ -327,147 +508,8 @@ class SmartMoneyMovementsReportHandler(BaseSQLiteHandler):
                 "movements": [],
                 "period": {
                     "days": days,
-                    "startDate": start_date.isoformat() if 'start_date' in locals() else "",
-                    "endDate": datetime.now().date().isoformat()
+                    "startDate": start_date,
+                    "endDate": end_date
                 },
                 "error": str(e)
-            } 
-
-    def filterTokensByWalletBreakdown(self, tokens, category=None, type_filter=None, min_wallets=0, min_amount=0):
-        """
-        Filter tokens based on wallet category, type, count, and invested amount.
-        
-        Args:
-            tokens: List of token data to filter
-            category: Wallet category (0-300K, 300K-1M, >1M)
-            type_filter: Wallet type filter (no-selling, <30%, >30%)
-            min_wallets: Minimum number of wallets required
-            min_amount: Minimum amount invested
-            
-        Returns:
-            Filtered list of tokens
-        """
-        filtered_tokens = []
-        
-        # Map category to the appropriate property access
-        category_map = {
-            "0-300K": "cat1",
-            "300K-1M": "cat2",
-            ">1M": "cat3"
-        }
-        
-        # Map type to index in categoryData
-        type_map = {
-            "no-selling": 0,  # No Selling
-            "<30%": 1,        # < 30%
-            ">30%": 2         # > 30%
-        }
-        
-        cat_key = category_map.get(category)
-        type_idx = type_map.get(type_filter)
-        
-        for token in tokens:
-            # Skip filtering if no filters are set
-            if not category and not type_filter and min_wallets <= 0 and min_amount <= 0:
-                filtered_tokens.append(token)
-                continue
-                
-            # Prepare wallet data as in renderWalletCategories function
-            categoryData = [
-                {
-                    "name": "No Selling",
-                    "cat1": {
-                        "count": token.get("pnl_category_1_no_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_1_no_withdrawal_amount", 0) or 0
-                    },
-                    "cat2": {
-                        "count": token.get("pnl_category_2_no_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_2_no_withdrawal_amount", 0) or 0
-                    },
-                    "cat3": {
-                        "count": token.get("pnl_category_3_no_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_3_no_withdrawal_amount", 0) or 0
-                    }
-                },
-                {
-                    "name": "< 30%",
-                    "cat1": {
-                        "count": token.get("pnl_category_1_partial_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_1_partial_withdrawal_amount", 0) or 0
-                    },
-                    "cat2": {
-                        "count": token.get("pnl_category_2_partial_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_2_partial_withdrawal_amount", 0) or 0
-                    },
-                    "cat3": {
-                        "count": token.get("pnl_category_3_partial_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_3_partial_withdrawal_amount", 0) or 0
-                    }
-                },
-                {
-                    "name": "> 30%",
-                    "cat1": {
-                        "count": token.get("pnl_category_1_significant_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_1_significant_withdrawal_amount", 0) or 0
-                    },
-                    "cat2": {
-                        "count": token.get("pnl_category_2_significant_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_2_significant_withdrawal_amount", 0) or 0
-                    },
-                    "cat3": {
-                        "count": token.get("pnl_category_3_significant_withdrawal_count", 0) or 0,
-                        "amount": token.get("pnl_category_3_significant_withdrawal_amount", 0) or 0
-                    }
-                }
-            ]
-            
-            # Apply filters
-            include_token = True
-            
-            # If both category and type are specified
-            if category and type_filter and type_idx is not None and cat_key:
-                wallet_count = categoryData[type_idx][cat_key]["count"]
-                wallet_amount = categoryData[type_idx][cat_key]["amount"]
-                
-                if wallet_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and wallet_amount < min_amount:
-                    include_token = False
-            
-            # If only category is specified
-            elif category and cat_key:
-                # Sum up wallets across all types for this category
-                total_count = sum(data[cat_key]["count"] for data in categoryData)
-                total_amount = sum(data[cat_key]["amount"] for data in categoryData)
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < min_amount:
-                    include_token = False
-            
-            # If only type is specified
-            elif type_filter and type_idx is not None:
-                # Sum up wallets across all categories for this type
-                total_count = sum(categoryData[type_idx][cat]["count"] for cat in ["cat1", "cat2", "cat3"])
-                total_amount = sum(categoryData[type_idx][cat]["amount"] for cat in ["cat1", "cat2", "cat3"])
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < min_amount:
-                    include_token = False
-            
-            # If only min_wallets or min_amount is specified
-            elif min_wallets > 0 or min_amount > 0:
-                # Sum up all wallets across all categories and types
-                total_count = sum(data[cat]["count"] for data in categoryData for cat in ["cat1", "cat2", "cat3"])
-                total_amount = sum(data[cat]["amount"] for data in categoryData for cat in ["cat1", "cat2", "cat3"])
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < min_amount:
-                    include_token = False
-            
-            if include_token:
-                filtered_tokens.append(token)
-                
-        return filtered_tokens 
\ No newline at end of file
+            }
@@ -4,7 +4,14 @@ from logs.logger import get_logger
 from datetime import datetime, timedelta
 from actions.DexscrennerAction import DexScreenerAction
 import time
-from tenacity import retry, stop_after_attempt, wait_exponential
+import heapq
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import requests
 from cache import cache_manager
 
 logger = get_logger(__name__)
@@ -17,28 +24,76 @@ EXCLUDED_TOKEN_IDS = [
     "So11111111111111111111111111111111111111112",  # Wrapped SOL
     "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"  # USDC
 ]
-SQL_EXCLUDED_TOKENS = "(" + ",".join([f"'{token}'" for token in EXCLUDED_TOKEN_IDS]) + ")"
+# Bound as parameters so the statement text stays the same when the list changes
+SQL_EXCLUDED_TOKENS = "(" + ",".join("?" * len(EXCLUDED_TOKEN_IDS)) + ")"
+
+# DexScreener accepts 30 addresses per request; chunks are fetched concurrently
+PRICE_CHUNK_SIZE = 30
+PRICE_FETCH_WORKERS = 8
+
+# Wallet report sort options (sortBy value -> result field)
+WALLET_SORT_FIELDS = {
+    "pnl": "totalPnl",
+    "invested": "totalInvested",
+    "tokens": "uniqueTokenCount",
+    "trades": "tradeCount"
+}
+SORT_ORDERS = frozenset(("asc", "desc"))
+
+# Per-token sort options for getWalletPNLDetails (lowercased sort_by -> token field)
+TOKEN_SORT_FIELDS = {
+    "tokenaddress": "tokenAddress",
+    "tokenname": "tokenName",
+    "totalinvested": "totalInvested",
+    "totaltakenout": "totalTakenOut",
+    "remainingcoins": "remainingCoins",
+    "realizedpnl": "realizedPnl",
+    "totalpnl": "totalPnl",
+    "pnlpercentage": "pnlPercentage",
+    "remainingvalue": "remainingValue",
+    "currentprice": "currentPrice"
+}
+
+# Top-PNL sort fields that don't depend on token prices, with the SQL expression ranking them
+SQL_RANKED_SORT_KEYS = {
+    "totalInvested": "total_invested",
+    "uniqueTokenCount": "unique_token_count",
+    "tradeCount": "COALESCE(CAST(tradecount AS INTEGER), 0)"
+}
+
+# Tables the reports join, whose indexes need planner statistics
+REPORT_TABLES = ("smartmoneymovements", "smartmoneywallets", "walletsinvested")
+
+# Rows ANALYZE samples per index when filling in missing statistics, so the first report
+# in a process never pays for a full scan of a large table
+ANALYSIS_LIMIT_ROWS = 1000
 
 class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
+    # Handlers are created per request; indexes and planner stats only need setting up once per process
+    _indexesReady = False
+
     def __init__(self, conn_manager):
         super().__init__(conn_manager)
         self.dex_screener = DexScreenerAction()
-        self._create_indexes()
+        if not SmartMoneyPNLReportHandler._indexesReady:
+            self._create_indexes()
 
     def _create_indexes(self):
         """Create database indexes for optimal query performance."""
         try:
             with self.conn_manager.transaction() as cursor:
-                # Index for date-based queries on smartmoneymovements
+                # Date-range aggregations use idx_smm_cover and wallet-based queries use
+                # idx_smm_wallet_date_token, both created by SmartMoneyMovementsHandler
+                
+                # Wallet details match on the normalized address; an index on the same
+                # expression turns those lookups into index seeks instead of full scans
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_smartmoneymovements_date_wallet_token 
-                    ON smartmoneymovements(date, walletaddress, tokenaddress)
+                    CREATE INDEX IF NOT EXISTS idx_smm_wallet_norm_date 
+                    ON smartmoneymovements(TRIM(LOWER(walletaddress)), date)
                 """)
-                
-                # Index for wallet-based queries
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_smartmoneymovements_wallet_date 
-                    ON smartmoneymovements(walletaddress, date)
+                    CREATE INDEX IF NOT EXISTS idx_smartmoneywallets_address_norm 
+                    ON smartmoneywallets(TRIM(LOWER(walletaddress)))
                 """)
                 
                 # Index for token-based queries
@@ -59,35 +114,100 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                     ON walletsinvested(tokenid, status)
                 """)
                 
+                # Planner statistics let the covering and expression indexes be picked over the
+                # UNIQUE autoindexes; only tables with unanalyzed indexes are sampled, with a row limit
+                self._analyzeMissingStats(cursor)
+                
                 logger.info("Database indexes created successfully")
+            SmartMoneyPNLReportHandler._indexesReady = True
         except Exception as e:
             logger.error(f"Error creating database indexes: {str(e)}")
 
-    def _get_date_range(self, days: int) -> Tuple[datetime.date, datetime.date]:
-        """Calculate the date range for the report."""
+    @staticmethod
+    def _analyzeMissingStats(cursor) -> None:
+        """ANALYZE (sampled, see ANALYSIS_LIMIT_ROWS) the report tables that have an index without sqlite_stat1 rows."""
+        placeholders = ",".join("?" * len(REPORT_TABLES))
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone():
+            cursor.execute(f"""
+                SELECT DISTINCT tbl_name FROM sqlite_master
+                WHERE type = 'index' AND tbl_name IN ({placeholders})
+                  AND name NOT IN (SELECT idx FROM sqlite_stat1 WHERE idx IS NOT NULL)
+            """, REPORT_TABLES)
+            tables = [row[0] for row in cursor.fetchall()]
+        else:
+            tables = list(REPORT_TABLES)
+        if not tables:
+            return
+        cursor.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT_ROWS}")
+        try:
+            for table in tables:
+                cursor.execute(f"ANALYZE {table}")
+        finally:
+            # Pooled connections go back with the default (unlimited) setting
+            cursor.execute("PRAGMA analysis_limit=0")
+
+    def _get_date_range(self, days: int) -> Tuple[str, str]:
+        """Calculate the date range for the report as ISO 'YYYY-MM-DD' strings, the format of smartmoneymovements.date."""
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
-        return start_date, end_date
+        return start_date.isoformat(), end_date.isoformat()
 
     def _get_sort_parameters(self, sort_by: str, sort_order: str) -> Tuple[str, str]:
         """Validate and normalize sort parameters."""
-        valid_sort_fields = {
-            "pnl": "totalPnl",
-            "invested": "totalInvested",
-            "tokens": "uniqueTokenCount",
-            "trades": "tradeCount"
-        }
-        valid_sort_orders = ["asc", "desc"]
-        sort_field = valid_sort_fields.get(sort_by.lower(), "totalPnl")
-        sort_order = sort_order.lower() if sort_order.lower() in valid_sort_orders else "desc"
-        return sort_field, sort_order
+        sort_field = WALLET_SORT_FIELDS.get(sort_by.lower(), "totalPnl")
+        sort_order = sort_order.lower()
+        return sort_field, sort_order if sort_order in SORT_ORDERS else "desc"
+
+    def _wallet_pnl(self, wallet_address: str, profitandloss: Any) -> float:
+        """Convert a joined smartmoneywallets.profitandloss value, 0 if missing or invalid."""
+        if profitandloss is None:
+            logger.warning(f"No data found in smartmoneywallets for wallet {wallet_address}")
+            return 0
+        try:
+            return float(profitandloss)
+        except ValueError:
+            logger.info(f"Invalid profitandloss value for wallet {wallet_address}: {profitandloss}")
+            return 0
+
+    def _wallet_trade_count(self, wallet_address: str, tradecount: Any) -> int:
+        """Convert a joined smartmoneywallets.tradecount value, 0 if missing or invalid."""
+        if tradecount is None:
+            return 0
+        try:
+            return int(tradecount)
+        except ValueError:
+            logger.info(f"Invalid tradecount value for wallet {wallet_address}: {tradecount}")
+            return 0
+
+    # Only transport failures are retried (HTTP errors like 4xx are deterministic), with jittered
+    # backoff so concurrent workers don't retry in lockstep; reraise the original error
+    @retry(stop=stop_after_attempt(3), wait=wait_random_exponential(multiplier=0.5, max=4),
+           retry=retry_if_exception_type((requests.Timeout, requests.ConnectionError)), reraise=True)
+    def _fetch_price_chunk(self, token_addresses: List[str]) -> Dict[str, Any]:
+        """Fetch prices for one DexScreener batch (at most PRICE_CHUNK_SIZE addresses)."""
+        return self.dex_screener.getBatchTokenPrices(token_addresses, raiseTransportErrors=True)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def _fetch_token_prices(self, token_addresses: List[str]) -> Dict[str, Any]:
         """Fetch token prices using enterprise cache manager."""
+        def fetch_chunk(chunk: List[str]) -> Dict[str, Any]:
+            """Fetch one chunk; a chunk that still fails after its retries only loses its own prices."""
+            try:
+                return self._fetch_price_chunk(chunk) or {}
+            except Exception as e:
+                logger.warning(f"Failed to fetch prices for {len(chunk)} tokens after retries: {str(e)}")
+                return {}
+
         def fetch_function(tokens: List[str]) -> Dict[str, Any]:
-            """Internal function to fetch uncached token prices."""
-            return self.dex_screener.getBatchTokenPrices(tokens)
+            """Internal function to fetch uncached token prices, one chunk per worker thread."""
+            chunks = [tokens[i:i + PRICE_CHUNK_SIZE] for i in range(0, len(tokens), PRICE_CHUNK_SIZE)]
+            if len(chunks) <= 1:
+                return fetch_chunk(tokens)
+            token_prices = {}
+            with ThreadPoolExecutor(max_workers=min(PRICE_FETCH_WORKERS, len(chunks))) as executor:
+                for chunk_prices in executor.map(fetch_chunk, chunks):
+                    token_prices.update(chunk_prices)
+            return token_prices
         
         return cache_manager.get_token_prices(token_addresses, fetch_function)
 
@@ -106,14 +226,18 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
 
         Returns:
             Dictionary with wallet PNL metrics, metadata, and win rate statistics.
+            Per-token balances are not included; getWalletPNLDetails is the source
+            for token-level data.
         """
-        # Cache key parameters
+        # Cache key parameters; sort options are normalized first so equivalent requests
+        # (e.g. "PNL"/"pnl", unknown fields falling back to totalPnl) share one entry
+        sort_field, sort_order = self._get_sort_parameters(sortBy, sortOrder)
         cache_params = {
             "type": "top_pnl",
             "days": days,
             "limit": limit,
-            "sortBy": sortBy,
-            "sortOrder": sortOrder,
+            "sortBy": sort_field,
+            "sortOrder": sort_order,
             "minTotalPnl": minTotalPnl,
             "minWalletPnl": minWalletPnl,
             "winRateThreshold": winRateThreshold
@@ -126,173 +250,220 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                 logger.info(f"Starting top PNL wallets report generation for {days} days")
                 
                 start_date, end_date = self._get_date_range(days)
-                sort_field, sort_order = self._get_sort_parameters(sortBy, sortOrder)
 
-                # Optimized query to fetch only necessary transaction data with pre-filtering
+                # Per-(wallet, token) sums; HAVING drops tokens with no investment in the period
+                # (bought before the period but sold during it). Wallet totals, token count and
+                # win-rate counts are window sums over each wallet's tokens, so only open
+                # positions (remaining balance > 0) need to be shipped back, already joined
+                # with the wallet's overall PNL and trade count. Wallets with no open position
+                # produce no rows and are excluded as before.
+                # minWalletPnl is applied on the joined wallet row (missing or unparsable PNL counts
+                # as 0). When the sort needs no prices and no minTotalPnl filter is set, the top
+                # `limit` wallets are also picked in SQL, so only their positions are fetched and priced;
+                # the report's token count is then taken over all of p in SQL so it matches the other path.
+                wallet_pnl_filter = minWalletPnl is not None and minWalletPnl > 0
+                rank_key = SQL_RANKED_SORT_KEYS.get(sort_field)
+                rank_in_sql = rank_key is not None and not (minTotalPnl is not None and minTotalPnl > 0)
+                top_wallets = ""
+                if rank_in_sql:
+                    top_wallets = f"""
+                WHERE 
+                    walletaddress IN (
+                        SELECT walletaddress
+                        FROM p
+                        GROUP BY walletaddress
+                        ORDER BY MAX({rank_key}) {sort_order.upper()}, walletaddress
+                        LIMIT ?
+                    )"""
                 query = f"""
+                WITH m AS (
+                    SELECT 
+                        walletaddress,
+                        tokenaddress,
+                        TOTAL(buytokenchange) AS total_buytoken,
+                        TOTAL(selltokenchange) AS total_selltoken,
+                        TOTAL(buyusdchange) AS total_buyusd,
+                        TOTAL(sellusdchange) AS total_sellusd
+                    FROM 
+                        smartmoneymovements
+                    WHERE 
+                        date >= ? AND date <= ?
+                        AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
+                        AND (buyusdchange > 0 OR sellusdchange > 0)
+                    GROUP BY 
+                        walletaddress, tokenaddress
+                    HAVING 
+                        TOTAL(buyusdchange) > 0
+                ),
+                t AS (
+                    SELECT 
+                        m.*,
+                        TOTAL(total_buyusd) OVER wallet AS total_invested,
+                        TOTAL(total_sellusd) OVER wallet AS total_taken_out,
+                        COUNT(*) OVER wallet AS unique_token_count,
+                        SUM(total_buyusd >= ?) OVER wallet AS threshold_count,
+                        SUM(total_buyusd >= ? AND total_sellusd - total_buyusd > 0) OVER wallet AS win_count
+                    FROM 
+                        m
+                    WINDOW wallet AS (PARTITION BY walletaddress)
+                ),
+                p AS (
+                    SELECT 
+                        t.walletaddress,
+                        t.tokenaddress,
+                        t.total_buytoken - t.total_selltoken AS remaining_balance,
+                        t.total_invested,
+                        t.total_taken_out,
+                        t.unique_token_count,
+                        t.threshold_count,
+                        t.win_count,
+                        w.profitandloss,
+                        w.tradecount
+                    FROM 
+                        t
+                        LEFT JOIN smartmoneywallets w USING (walletaddress)
+                    WHERE 
+                        t.total_buytoken - t.total_selltoken > 0
+                        {"AND COALESCE(CAST(w.profitandloss AS REAL), 0) >= ?" if wallet_pnl_filter else ""}
+                )
                 SELECT 
-                    walletaddress,
-                    tokenaddress,
-                    SUM(buytokenchange) AS total_buytoken,
-                    SUM(selltokenchange) AS total_selltoken,
-                    SUM(buyusdchange) AS total_buyusd,
-                    SUM(sellusdchange) AS total_sellusd
-                FROM 
-                    smartmoneymovements
-                WHERE 
-                    date >= ? AND date <= ?
-                    AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
-                    AND (buyusdchange > 0 OR sellusdchange > 0)
-                GROUP BY 
-                    walletaddress, tokenaddress
-                HAVING 
-                    (SUM(buyusdchange) > 0 OR SUM(sellusdchange) > 0)
+                    p.*,
+                    {"(SELECT COUNT(DISTINCT tokenaddress) FROM p)" if rank_in_sql else "NULL"} AS open_token_count
+                FROM p{top_wallets}
                 """
+                win_rate_enabled = winRateThreshold is not None and winRateThreshold > 0
+                threshold = winRateThreshold if win_rate_enabled else None
                 
-                with self.transaction() as cursor:
-                    cursor.execute(query, (start_date, end_date))
-                    results = cursor.fetchall()
-
-                    wallet_data = {}
-                    for row in results:
-                        wallet_address = row['walletaddress']  # Already normalized
-                        token_address = row['tokenaddress']
-                        total_buytoken = float(row['total_buytoken'] or 0)
-                        total_selltoken = float(row['total_selltoken'] or 0)
-                        total_buyusd = float(row['total_buyusd'] or 0)
-                        total_sellusd = float(row['total_sellusd'] or 0)
-                        remaining_balance = total_buytoken - total_selltoken
-
-                        # CRITICAL FIX: Only include tokens where there was actual investment in the time range
-                        # Skip tokens with zero buyusdchange (bought before period but sold during period)
-                        if total_buyusd <= 0:
-                            continue
-
-                        if wallet_address not in wallet_data:
-                            wallet_data[wallet_address] = {
-                                'total_invested': 0,
-                                'total_taken_out': 0,
-                                'unique_tokens': set(),
-                                'token_balances': {},
-                                'token_investments': []  # Store individual token investment data
-                            }
-
-                        wallet = wallet_data[wallet_address]
-                        wallet['total_invested'] += total_buyusd
-                        wallet['total_taken_out'] += total_sellusd
-                        wallet['unique_tokens'].add(token_address)
-                        if remaining_balance > 0:
-                            wallet['token_balances'][token_address] = remaining_balance
-                        
-                        # Store individual token investment data for win rate calculation
-                        token_pnl = total_sellusd - total_buyusd
-                        wallet['token_investments'].append({
-                            'token_address': token_address,
-                            'invested': total_buyusd,
-                            'pnl': token_pnl
-                        })
-
-                    wallets = []
-                    for wallet_address, data in wallet_data.items():
-                        # Only include wallets that have actual investments (total_invested > 0)
-                        # This fixes the PNL calculation bug where tokens bought before the time period
-                        # but sold within it would show incorrect positive PNL
-                        if data['total_invested'] > 0 and data['token_balances']:
-                            realized_pnl = data['total_taken_out'] - data['total_invested']
-                            
-                            # Calculate per-wallet win rate if threshold is provided
-                            wallet_win_rate = 0
-                            wallet_threshold_count = 0
-                            wallet_win_count = 0
-                            
-                            if winRateThreshold is not None and winRateThreshold > 0:
-                                # Find tokens where investment >= threshold
-                                threshold_tokens = [t for t in data['token_investments'] if t['invested'] >= winRateThreshold]
-                                wallet_threshold_count = len(threshold_tokens)
-                                
-                                # Count winning tokens (positive PNL)
-                                wallet_win_count = len([t for t in threshold_tokens if t['pnl'] > 0])
-                                
-                                # Calculate win rate percentage
-                                wallet_win_rate = (wallet_win_count / wallet_threshold_count * 100) if wallet_threshold_count > 0 else 0
-                            
-                            wallets.append({
-                                'walletAddress': wallet_address,
-                                'totalInvested': data['total_invested'],
-                                'totalTakenOut': data['total_taken_out'],
-                                'uniqueTokenCount': len(data['unique_tokens']),
-                                'realizedPnl': realized_pnl,
-                                'tokenBalances': data['token_balances'],
-                                'remainingValue': 0,
-                                'totalPnl': realized_pnl,
-                                'tradeCount': 0,
-                                'walletPnl': 0,
-                                'winRate': round(wallet_win_rate, 2),
-                                'thresholdCount': wallet_threshold_count,
-                                'winCount': wallet_win_count
-                            })
-
-                    if wallets:
-                        # Optimize wallet info query by only fetching data for relevant wallets
-                        wallet_addresses = [w['walletAddress'] for w in wallets]
-                        placeholders = ','.join(['?' for _ in wallet_addresses])
-                        wallet_info_query = f"""
-                        SELECT walletaddress, profitandloss, tradecount
-                        FROM smartmoneywallets
-                        WHERE walletaddress IN ({placeholders})
-                        """
-                        cursor.execute(wallet_info_query, wallet_addresses)
-                        wallet_info = {row['walletaddress']: row for row in cursor.fetchall()}
-                        
-                        for wallet in wallets:
-                            info = wallet_info.get(wallet['walletAddress'], {}) 
-                            if not info:
-                                logger.warning(f"No data found in smartmoneywallets for wallet {wallet['walletAddress']}")
-                            try:
-                                wallet['walletPnl'] = float(info['profitandloss'])
-                            except ValueError:
-                                logger.info(f"Invalid profitandloss value for wallet {wallet['walletAddress']}: {info.get('profitandloss')}")
-                                wallet['walletPnl'] = 0
-                                
-                            try:
-                                wallet['tradeCount'] = int(info['tradecount'])
-                            except ValueError:
-                                logger.info(f"Invalid tradecount value for wallet {wallet['walletAddress']}: {info.get('tradecount')}")
-                                wallet['tradeCount'] = 0
-
-                    if minWalletPnl is not None and minWalletPnl > 0:
-                        wallets = [w for w in wallets if w['walletPnl'] >= minWalletPnl]
-
-                    # Optimize token price fetching by only getting prices for tokens with balances
-                    all_token_addresses = set()
-                    for wallet in wallets:
-                        all_token_addresses.update(wallet['tokenBalances'].keys())
-
-                    # Batch token price fetching with error handling
-                    token_prices = {}
-                    if all_token_addresses:
-                        try:
-                            token_prices = self._fetch_token_prices(list(all_token_addresses))
-                        except Exception as e:
-                            logger.warning(f"Failed to fetch token prices, continuing without prices: {str(e)}")
-                            token_prices = {}
-
-                    for wallet in wallets:
-                        remaining_value = 0
-                        for token, balance in wallet['tokenBalances'].items():
-                            token_price = token_prices.get(token)
-                            price = token_price.price if token_price and token_price.marketCap > 10000 else 0
-                            current_remaining_value = balance * price
-                            if token_price and token_price.marketCap > current_remaining_value:
-                                remaining_value += current_remaining_value
-                        wallet['remainingValue'] = remaining_value
-                        wallet['totalPnl'] = wallet['realizedPnl'] + remaining_value
-
-                    if minTotalPnl is not None and minTotalPnl > 0:
-                        wallets = [w for w in wallets if w['totalPnl'] >= minTotalPnl]
+                with self.readTransaction() as cursor:
+                    params = [start_date, end_date, *EXCLUDED_TOKEN_IDS, threshold, threshold]
+                    if wallet_pnl_filter:
+                        params.append(minWalletPnl)
+                    if rank_in_sql:
+                        params.append(limit)
+                    cursor.execute(query, params)
 
-                    wallets.sort(key=lambda x: x[sort_field], reverse=(sort_order == "desc"))
-                    wallets = wallets[:limit]
+                    # Wallets and their open positions are kept column-wise; result dicts are only
+                    # built for the wallets that make it into the report
+                    wallet_addresses = []
+                    wallet_index = {}
+                    wallet_invested = array('d')
+                    wallet_taken_out = array('d')
+                    wallet_token_counts = array('q')
+                    wallet_threshold_counts = array('q')
+                    wallet_win_counts = array('q')
+                    wallet_trade_counts = array('q')
+                    wallet_pnls = array('d')
+                    tokens = []
+                    token_index = {}
+                    position_wallets = array('q')
+                    position_tokens = array('q')
+                    position_balances = array('d')
+                    open_token_count = 0
+                    # Rows are unpacked by position (SELECT order) rather than looked up by name
+                    for (wallet_address, token_address, remaining_balance, total_invested, total_taken_out,
+                         unique_token_count, threshold_count, win_count, profitandloss, tradecount,
+                         open_token_count) in cursor:
+                        index = wallet_index.get(wallet_address)  # Already normalized
+                        if index is None:
+                            index = wallet_index[wallet_address] = len(wallet_addresses)
+                            wallet_addresses.append(wallet_address)
+                            wallet_invested.append(total_invested)
+                            wallet_taken_out.append(total_taken_out)
+                            wallet_token_counts.append(unique_token_count)
+                            # Win-rate counts are window SUMs of comparisons, already integers
+                            wallet_threshold_counts.append(threshold_count if win_rate_enabled else 0)
+                            wallet_win_counts.append(win_count if win_rate_enabled else 0)
+                            wallet_trade_counts.append(self._wallet_trade_count(wallet_address, tradecount))
+                            wallet_pnls.append(self._wallet_pnl(wallet_address, profitandloss))
+                        token = token_index.get(token_address)
+                        if token is None:
+                            token = token_index[token_address] = len(tokens)
+                            tokens.append(token_address)
+                        position_wallets.append(index)
+                        position_tokens.append(token)
+                        position_balances.append(remaining_balance)
+
+                # Zero-copy views over the wallet and position columns
+                wallet_count = len(wallet_addresses)
+                invested = np.frombuffer(wallet_invested, dtype=np.float64)
+                taken_out = np.frombuffer(wallet_taken_out, dtype=np.float64)
+                token_counts = np.frombuffer(wallet_token_counts, dtype=np.int64)
+                trade_counts = np.frombuffer(wallet_trade_counts, dtype=np.int64)
+                position_wallet_ids = np.frombuffer(position_wallets, dtype=np.int64)
+                position_token_ids = np.frombuffer(position_tokens, dtype=np.int64)
+                balances = np.frombuffer(position_balances, dtype=np.float64)
+
+                # Optimize token price fetching by only getting prices for tokens with balances
+                all_token_addresses = set(tokens)
+
+                # Batch token price fetching with error handling; runs after the read transaction
+                # has ended so the connection is not held across the HTTP calls
+                token_prices = {}
+                if all_token_addresses:
+                    try:
+                        token_prices = self._fetch_token_prices(list(all_token_addresses))
+                    except Exception as e:
+                        logger.warning(f"Failed to fetch token prices, continuing without prices: {str(e)}")
+                        token_prices = {}
+
+                # Per-token price and market cap; tokens without a price never count
+                token_price_values = np.zeros(len(tokens))
+                token_market_caps = np.zeros(len(tokens))
+                token_priced = np.zeros(len(tokens), dtype=bool)
+                for token, token_address in enumerate(tokens):
+                    token_price = token_prices.get(token_address)
+                    if token_price:
+                        token_priced[token] = True
+                        token_market_caps[token] = token_price.marketCap
+                        token_price_values[token] = token_price.price if token_price.marketCap > 10000 else 0
+
+                # A position counts only when its value stays below the token's market cap
+                position_values = balances * token_price_values[position_token_ids]
+                counted = token_priced[position_token_ids] & (token_market_caps[position_token_ids] > position_values)
+                remaining_values = np.bincount(
+                    position_wallet_ids, weights=np.where(counted, position_values, 0.0), minlength=wallet_count
+                )
+                realized_pnls = taken_out - invested
+                total_pnls = realized_pnls + remaining_values
+
+                included = np.ones(wallet_count, dtype=bool)
+                if minTotalPnl is not None and minTotalPnl > 0:
+                    included = total_pnls >= minTotalPnl
+
+                # Only the top `limit` wallets are returned; a stable argsort keeps tied wallets
+                # in first-seen order
+                sort_columns = {
+                    "totalPnl": total_pnls,
+                    "totalInvested": invested,
+                    "uniqueTokenCount": token_counts,
+                    "tradeCount": trade_counts
+                }
+                candidates = np.flatnonzero(included)
+                sort_values = sort_columns[sort_field][candidates]
+                if sort_order == "desc":
+                    sort_values = -sort_values
+                selected = candidates[np.argsort(sort_values, kind="stable")[:limit]].tolist()
+
+                wallets = []
+                for index in selected:
+                    wallet_threshold_count = wallet_threshold_counts[index]
+                    wallet_win_count = wallet_win_counts[index]
+                    # Per-wallet win rate over tokens with investment >= threshold
+                    wallet_win_rate = (wallet_win_count / wallet_threshold_count * 100) if wallet_threshold_count > 0 else 0
+                    wallets.append({
+                        'walletAddress': wallet_addresses[index],
+                        'totalInvested': wallet_invested[index],
+                        'totalTakenOut': wallet_taken_out[index],
+                        'uniqueTokenCount': wallet_token_counts[index],
+                        'realizedPnl': float(realized_pnls[index]),
+                        'remainingValue': float(remaining_values[index]),
+                        'totalPnl': float(total_pnls[index]),
+                        'tradeCount': wallet_trade_counts[index],
+                        'walletPnl': wallet_pnls[index],
+                        'winRate': round(wallet_win_rate, 2),
+                        'thresholdCount': wallet_threshold_count,
+                        'winCount': wallet_win_count
+                    })
 
                 end_time = time.time()
                 logger.info(f"Report generated in {end_time - start_time:.2f} seconds")
@@ -303,13 +474,14 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                     'wallets': wallets,
                     'period': {
                         'days': days,
-                        'startDate': start_date.isoformat(),
-                        'endDate': end_date.isoformat()
+                        'startDate': start_date,
+                        'endDate': end_date
                     },
                     'metrics': {
                         'executionTimeSeconds': round(end_time - start_time, 2),
                         'walletCount': len(wallets),
-                        'tokenCount': len(all_token_addresses)
+                        # Distinct open-position tokens across every wallet in p
+                        'tokenCount': open_token_count if rank_in_sql else len(all_token_addresses)
                     }
                 }
                 
@@ -364,10 +536,10 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                 SELECT 
                     tokenaddress,
                     COALESCE(MAX(buytokenname), MAX(selltokenname), 'Unknown') AS token_name,
-                    SUM(buytokenchange) AS buy_token_change,
-                    SUM(selltokenchange) AS sell_token_change,
-                    SUM(buyusdchange) AS buy_usd_change,
-                    SUM(sellusdchange) AS sell_usd_change
+                    TOTAL(buytokenchange) AS buy_token_change,
+                    TOTAL(selltokenchange) AS sell_token_change,
+                    TOTAL(buyusdchange) AS buy_usd_change,
+                    TOTAL(sellusdchange) AS sell_usd_change
                 FROM 
                     smartmoneymovements
                 WHERE 
@@ -377,27 +549,24 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                 GROUP BY 
                     tokenaddress
                 """
-                with self.transaction() as cursor:
-                    cursor.execute(query, (wallet_address, start_date, end_date))
-                    rows = cursor.fetchall()
+                with self.readTransaction() as cursor:
+                    cursor.execute(query, (wallet_address, start_date, end_date, *EXCLUDED_TOKEN_IDS))
+                    first_row = cursor.fetchone()
 
-                    if not rows:
+                    if first_row is None:
                         logger.info(f"No transaction data found for wallet {wallet_address}")
                         return None
+                    # Remaining rows are streamed from the cursor
+                    rows = chain((first_row,), cursor)
 
                     total_invested = 0
                     total_taken_out = 0
-                    unique_tokens = set()
+                    unique_token_count = 0  # Rows are grouped by token, so each counted row is a distinct token
                     tokens = []
                     token_addresses_to_fetch = set()
 
-                    for row in rows:
-                        token_address = row['tokenaddress']
-                        token_name = row['token_name']
-                        buy_token_change = float(row['buy_token_change'] or 0)
-                        sell_token_change = float(row['sell_token_change'] or 0)
-                        buy_usd_change = float(row['buy_usd_change'] or 0)
-                        sell_usd_change = float(row['sell_usd_change'] or 0)
+                    for (token_address, token_name, buy_token_change, sell_token_change,
+                         buy_usd_change, sell_usd_change) in rows:
                         remaining_balance = buy_token_change - sell_token_change
                         token_realized_pnl = sell_usd_change - buy_usd_change
 
@@ -408,7 +577,7 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
 
                         total_invested += buy_usd_change
                         total_taken_out += sell_usd_change
-                        unique_tokens.add(token_address)
+                        unique_token_count += 1
 
                         token = {
                             'tokenAddress': token_address,
@@ -436,14 +605,9 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                         "SELECT profitandloss, tradecount FROM smartmoneywallets WHERE TRIM(LOWER(walletaddress)) = ?",
                         (wallet_address,)
                     )
-                    wallet_info = cursor.fetchone()
-                    if wallet_info:
-                        wallet_pnl = float(wallet_info['profitandloss'] or 0)
-                        trade_count = int(wallet_info['tradecount'] or 0)
-                    else:
-                        logger.warning(f"No data found in smartmoneywallets for wallet {wallet_address}")
-                        wallet_pnl = 0
-                        trade_count = 0
+                    profitandloss, tradecount = cursor.fetchone() or (None, None)
+                    wallet_pnl = self._wallet_pnl(wallet_address, profitandloss)
+                    trade_count = self._wallet_trade_count(wallet_address, tradecount)
 
                 realized_pnl = total_taken_out - total_invested
 
@@ -477,27 +641,14 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                     total_pnl_percentage = (total_pnl / total_invested) * 100
                 
                 # Sort tokens based on requested field
-                valid_sort_fields = {
-                    "tokenaddress": "tokenAddress",
-                    "tokenname": "tokenName", 
-                    "totalinvested": "totalInvested",
-                    "totaltakenout": "totalTakenOut",
-                    "remainingcoins": "remainingCoins",
-                    "realizedpnl": "realizedPnl",
-                    "totalpnl": "totalPnl",
-                    "pnlpercentage": "pnlPercentage",
-                    "remainingvalue": "remainingValue",
-                    "currentprice": "currentPrice"
-                }
-                
-                sort_field = valid_sort_fields.get(sort_by.lower(), "totalPnl")
+                sort_field = TOKEN_SORT_FIELDS.get(sort_by.lower(), "totalPnl")
                 reverse_order = sort_order.lower() == "desc"
                 
                 try:
-                    tokens = sorted(tokens, key=lambda x: x.get(sort_field, 0), reverse=reverse_order)
+                    tokens.sort(key=itemgetter(sort_field), reverse=reverse_order)
                 except (KeyError, TypeError) as e:
                     logger.warning(f"Error sorting tokens by {sort_field}: {e}. Using default sort.")
-                    tokens = sorted(tokens, key=lambda x: x.get("totalPnl", 0), reverse=True)
+                    tokens.sort(key=itemgetter("totalPnl"), reverse=True)
                 
                 # Calculate per-wallet win rate if threshold is provided
                 wallet_win_rate = 0
@@ -524,7 +675,7 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                         'totalRealizedPnl': realized_pnl,
                         'totalPnl': total_pnl,
                         'totalPnlPercentage': total_pnl_percentage,
-                        'uniqueTokenCount': len(unique_tokens),
+                        'uniqueTokenCount': unique_token_count,
                         'tradeCount': trade_count,
                         'walletPnl': wallet_pnl,
                         'winRate': round(wallet_win_rate, 2),
@@ -534,12 +685,12 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                     'tokens': tokens,  # Include detailed token information
                     'period': {
                         'days': days,
-                        'startDate': start_date.isoformat(),
-                        'endDate': end_date.isoformat()
+                        'startDate': start_date,
+                        'endDate': end_date
                     },
                     'metrics': {
                         'executionTimeSeconds': round(end_time - start_time, 2),
-                        'tokenCount': len(unique_tokens)
+                        'tokenCount': unique_token_count
                     }
                 }
             
@@ -568,14 +719,16 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
         Returns:
             Dictionary with wallet PNL metrics and token-specific data
         """
-        # Cache key parameters
+        # Cache key parameters; sort options are normalized first so equivalent requests
+        # (e.g. "PNL"/"pnl", unknown fields falling back to totalPnl) share one entry
+        sort_field, sort_order = self._get_sort_parameters(sortBy, sortOrder)
         cache_params = {
             "type": "token_investors",
             "token_id": token_id,
             "days": days,
             "limit": limit,
-            "sortBy": sortBy,
-            "sortOrder": sortOrder,
+            "sortBy": sort_field,
+            "sortOrder": sort_order,
             "minTotalPnl": minTotalPnl,
             "minWalletPnl": minWalletPnl
         }
@@ -587,223 +740,173 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                 logger.info(f"Starting token investors PNL report for token {token_id} over {days} days")
                 
                 start_date, end_date = self._get_date_range(days)
-                sort_field, sort_order = self._get_sort_parameters(sortBy, sortOrder)
                 
-                # Get all wallet addresses that have invested in this token
-                with self.conn_manager.transaction() as cursor:
-                    # Get all wallet addresses that have invested in this token
-                    cursor.execute("""
-                        SELECT DISTINCT walletaddress 
-                        FROM walletsinvested 
-                        WHERE tokenid = ? AND status = 1
-                    """, (token_id,))
-                    
-                    wallet_addresses = [row['walletaddress'] for row in cursor.fetchall()]
-                    
-                    if not wallet_addresses:
-                        logger.info(f"No wallets found with investments in token {token_id}")
-                        return {
-                            'wallets': [],
-                            'token': {'tokenId': token_id, 'tokenName': 'Unknown'},
-                            'period': {
-                                'days': days,
-                                'startDate': start_date.isoformat(),
-                                'endDate': end_date.isoformat()
-                            },
-                            'metrics': {
-                                'executionTimeSeconds': 0,
-                                'walletCount': 0
-                            }
-                        }
-                    
-                    # We'll get the token name from the query results
-                    token_name = 'Unknown'  # Default value, will be updated when processing results
-                    
-                    # Create placeholders for SQL IN clause
-                    placeholders = ','.join(['?' for _ in wallet_addresses])
-                    
-                    # Optimized query to get all transaction data for these wallets with pre-filtering
-                    query = f"""
+                # We'll get the token name from the query results
+                token_name = 'Unknown'  # Default value, will be updated when processing results
+
+                # One statement for the whole report: wallets with an active investment in this token
+                # (walletsinvested), their per-(wallet, token) sums for the period, and their overall
+                # PNL and trade count. HAVING drops tokens with no investment in the period (bought
+                # before the period but sold during it). Wallet totals and token counts are window
+                # sums over each wallet's tokens, and wallets whose remaining tokens don't include
+                # token_id are dropped in SQL, as are wallets below minWalletPnl (missing or
+                # unparsable PNL counts as 0).
+                wallet_pnl_filter = minWalletPnl is not None and minWalletPnl > 0
+                query = f"""
+                WITH m AS (
                     SELECT 
                         walletaddress,
                         tokenaddress,
                         COALESCE(MAX(buytokenname), MAX(selltokenname), 'Unknown') AS token_name,
-                        SUM(buytokenchange) AS total_buytoken,
-                        SUM(selltokenchange) AS total_selltoken,
-                        SUM(buyusdchange) AS total_buyusd,
-                        SUM(sellusdchange) AS total_sellusd
+                        TOTAL(buytokenchange) AS total_buytoken,
+                        TOTAL(selltokenchange) AS total_selltoken,
+                        TOTAL(buyusdchange) AS total_buyusd,
+                        TOTAL(sellusdchange) AS total_sellusd
                     FROM 
                         smartmoneymovements
                     WHERE 
-                        walletaddress IN ({placeholders})
+                        walletaddress IN (
+                            SELECT walletaddress 
+                            FROM walletsinvested 
+                            WHERE tokenid = ? AND status = 1
+                        )
                         AND date >= ? AND date <= ?
                         AND tokenaddress NOT IN {SQL_EXCLUDED_TOKENS}
                         AND (buyusdchange > 0 OR sellusdchange > 0)
                     GROUP BY 
                         walletaddress, tokenaddress
                     HAVING 
-                        (SUM(buyusdchange) > 0 OR SUM(sellusdchange) > 0)
-                    """
-                    
-                    params = wallet_addresses + [start_date, end_date]
+                        TOTAL(buyusdchange) > 0
+                ),
+                t AS (
+                    SELECT 
+                        m.*,
+                        TOTAL(total_buyusd) OVER wallet AS total_invested,
+                        TOTAL(total_sellusd) OVER wallet AS total_taken_out,
+                        COUNT(*) OVER wallet AS unique_token_count,
+                        MAX(tokenaddress = ?) OVER wallet AS holds_token
+                    FROM 
+                        m
+                    WINDOW wallet AS (PARTITION BY walletaddress)
+                )
+                SELECT 
+                    t.walletaddress,
+                    t.tokenaddress,
+                    t.token_name,
+                    t.total_buytoken,
+                    t.total_selltoken,
+                    t.total_buyusd,
+                    t.total_sellusd,
+                    t.total_invested,
+                    t.total_taken_out,
+                    t.unique_token_count,
+                    w.profitandloss,
+                    w.tradecount
+                FROM 
+                    t
+                    LEFT JOIN smartmoneywallets w USING (walletaddress)
+                WHERE 
+                    t.holds_token
+                    {"AND COALESCE(CAST(w.profitandloss AS REAL), 0) >= ?" if wallet_pnl_filter else ""}
+                """
+
+                with self.readTransaction() as cursor:
+                    params = [token_id, start_date, end_date, *EXCLUDED_TOKEN_IDS, token_id]
+                    if wallet_pnl_filter:
+                        params.append(minWalletPnl)
                     cursor.execute(query, params)
-                    results = cursor.fetchall()
-                    
-                    # Process transaction data
-                    wallet_data = {}
-                    
-                    # Process transaction data
-                    for row in results:
-                        wallet_address = row['walletaddress']
-                        token_address = row['tokenaddress']
-                        total_buytoken = float(row['total_buytoken'] or 0)
-                        total_selltoken = float(row['total_selltoken'] or 0)
-                        total_buyusd = float(row['total_buyusd'] or 0)
-                        total_sellusd = float(row['total_sellusd'] or 0)
-                        remaining_balance = total_buytoken - total_selltoken
-                        
-                        # CRITICAL FIX: Only include tokens where there was actual investment in the time range
-                        # Skip tokens with zero buyusdchange (bought before period but sold during period)
-                        if total_buyusd <= 0:
-                            continue
-                        
-                        if wallet_address not in wallet_data:
-                            wallet_data[wallet_address] = {
-                                'total_invested': 0,
-                                'total_taken_out': 0,
-                                'unique_tokens': set(),
-                                'token_balances': {},
+
+                    # Build wallet list with PNL data; totals come from the first row of each wallet
+                    wallets = []
+                    wallet_index = {}
+                    for (wallet_address, token_address, row_token_name, total_buytoken, total_selltoken,
+                         total_buyusd, total_sellusd, total_invested, total_taken_out,
+                         unique_token_count, profitandloss, tradecount) in cursor:
+                        wallet = wallet_index.get(wallet_address)
+                        if wallet is None:
+                            realized_pnl = total_taken_out - total_invested
+                            wallet = wallet_index[wallet_address] = {
+                                'walletAddress': wallet_address,
+                                'totalInvested': total_invested,
+                                'totalTakenOut': total_taken_out,
+                                'uniqueTokenCount': unique_token_count,
+                                'realizedPnl': realized_pnl,
+                                'remainingValue': 0,
+                                'totalPnl': realized_pnl,
+                                'tradeCount': self._wallet_trade_count(wallet_address, tradecount),
+                                'walletPnl': self._wallet_pnl(wallet_address, profitandloss),
                                 'tokens': []
                             }
-                        
-                        wallet = wallet_data[wallet_address]
-                        wallet['total_invested'] += total_buyusd
-                        wallet['total_taken_out'] += total_sellusd
-                        wallet['unique_tokens'].add(token_address)
-                        
-                        if remaining_balance > 0:
-                            wallet['token_balances'][token_address] = remaining_balance
+                            wallets.append(wallet)
                         
                         # Create token detail entry
                         token_realized_pnl = total_sellusd - total_buyusd
-                        token_name = row['token_name'] or 'Unknown'
+                        token_name = row_token_name or 'Unknown'
                         
-                        token_detail = {
+                        wallet['tokens'].append({
                             'tokenAddress': token_address,
                             'tokenName': token_name,
                             'buyTokenChange': total_buytoken,
                             'sellTokenChange': total_selltoken,
                             'buyUsdChange': total_buyusd,
                             'sellUsdChange': total_sellusd,
-                            'remainingBalance': remaining_balance,
+                            'remainingBalance': total_buytoken - total_selltoken,
                             'realizedPnl': token_realized_pnl,
                             'currentPrice': 0,
                             'remainingValue': 0,
                             'totalPnl': token_realized_pnl
-                        }
-                        
-                        wallet['tokens'].append(token_detail)
-                    
-                    # Build wallet list with PNL data
-                    wallets = []
-                    for wallet_address, data in wallet_data.items():
-                        # Only include wallets that have actual investments (total_invested > 0)
-                        # This fixes the PNL calculation bug where tokens bought before the time period
-                        # but sold within it would show incorrect positive PNL
-                        if data['total_invested'] > 0 and (token_id in data['token_balances'] or any(token == token_id for token in data['unique_tokens'])):
-                            realized_pnl = data['total_taken_out'] - data['total_invested']
-                            wallets.append({
-                                'walletAddress': wallet_address,
-                                'totalInvested': data['total_invested'],
-                                'totalTakenOut': data['total_taken_out'],
-                                'uniqueTokenCount': len(data['unique_tokens']),
-                                'realizedPnl': realized_pnl,
-                                'tokenBalances': data['token_balances'],
-                                'remainingValue': 0,
-                                'totalPnl': realized_pnl,
-                                'tradeCount': 0,
-                                'walletPnl': 0,
-                                'tokens': data['tokens']
-                            })
-                    
-                    # Get wallet PNL and trade count data
-                    if wallets:
-                        wallet_addresses_list = [w['walletAddress'] for w in wallets]
-                        placeholders = ','.join(['?' for _ in wallet_addresses_list])
-                        
-                        wallet_info_query = f"""
-                        SELECT walletaddress, profitandloss, tradecount
-                        FROM smartmoneywallets
-                        WHERE walletaddress IN ({placeholders})
-                        """
-                        cursor.execute(wallet_info_query, wallet_addresses_list)
-                        wallet_info = {row['walletaddress']: row for row in cursor.fetchall()}
-                                
-                        for wallet in wallets:
-                            info = wallet_info.get(wallet['walletAddress'], {}) 
-                            if not info:
-                                logger.warning(f"No data found in smartmoneywallets for wallet {wallet['walletAddress']}")
-                            try:
-                                wallet['walletPnl'] = float(info['profitandloss'])
-                            except ValueError:
-                                logger.info(f"Invalid profitandloss value for wallet {wallet['walletAddress']}: {info.get('profitandloss')}")
-                                wallet['walletPnl'] = 0
-                                
-                            try:
-                                wallet['tradeCount'] = int(info['tradecount'])
-                            except ValueError:
-                                logger.info(f"Invalid tradecount value for wallet {wallet['walletAddress']}: {info.get('tradecount')}")
-                                wallet['tradeCount'] = 0
-                    
-                    # Apply wallet PNL filter if specified
-                    if minWalletPnl is not None and minWalletPnl > 0:
-                        wallets = [w for w in wallets if w['walletPnl'] >= minWalletPnl]
-                    
-                    # Optimize token price fetching by only getting prices for tokens with balances
-                    all_token_addresses = set()
-                    for wallet in wallets:
-                        all_token_addresses.update(wallet['tokenBalances'].keys())
+                        })
+
+                if not wallets:
+                    logger.info(f"No wallets found with investments in token {token_id}")
                     
-                    # Batch token price fetching with error handling
-                    token_prices = {}
-                    if all_token_addresses:
-                        try:
-                            token_prices = self._fetch_token_prices(list(all_token_addresses))
-                        except Exception as e:
-                            logger.warning(f"Failed to fetch token prices, continuing without prices: {str(e)}")
-                            token_prices = {}
+                # Optimize token price fetching by only getting prices for tokens with balances
+                all_token_addresses = set()
+                for wallet in wallets:
+                    all_token_addresses.update(t['tokenAddress'] for t in wallet['tokens'] if t['remainingBalance'] > 0)
+                
+                # Batch token price fetching with error handling; runs after the read transaction
+                # has ended so the connection is not held across the HTTP calls
+                token_prices = {}
+                if all_token_addresses:
+                    try:
+                        token_prices = self._fetch_token_prices(list(all_token_addresses))
+                    except Exception as e:
+                        logger.warning(f"Failed to fetch token prices, continuing without prices: {str(e)}")
+                        token_prices = {}
+                
+                for wallet in wallets:
+                    remaining_value = 0
                     
-                    for wallet in wallets:
-                        remaining_value = 0
-                        
-                        # Update token prices and values for all tokens in the wallet
-                        for token_detail in wallet['tokens']:
-                            token_address = token_detail['tokenAddress']
-                            token_price = token_prices.get(token_address)
-                            price = token_price.price if token_price and token_price.marketCap > 10000 else 0
-                            token_detail['currentPrice'] = price
-                            
-                            # Calculate remaining value if there's a balance
-                            if token_detail['remainingBalance'] > 0:
-                                current_remaining_value = token_detail['remainingBalance'] * price
-                                if token_price and token_price.marketCap > current_remaining_value:
-                                    token_detail['remainingValue'] = current_remaining_value
-                                else:
-                                    token_detail['currentPrice'] = 0
-                                    token_detail['remainingValue'] = 0
-                                token_detail['totalPnl'] = token_detail['realizedPnl'] + token_detail['remainingValue']
-                                remaining_value += token_detail['remainingValue']
+                    # Update token prices and values for all tokens in the wallet
+                    for token_detail in wallet['tokens']:
+                        token_address = token_detail['tokenAddress']
+                        token_price = token_prices.get(token_address)
+                        price = token_price.price if token_price and token_price.marketCap > 10000 else 0
+                        token_detail['currentPrice'] = price
                         
-                        wallet['remainingValue'] = remaining_value
-                        wallet['totalPnl'] = wallet['realizedPnl'] + remaining_value
-                    
-                    # Apply total PNL filter if specified
-                    if minTotalPnl is not None and minTotalPnl > 0:
-                        wallets = [w for w in wallets if w['totalPnl'] >= minTotalPnl]
+                        # Calculate remaining value if there's a balance
+                        if token_detail['remainingBalance'] > 0:
+                            current_remaining_value = token_detail['remainingBalance'] * price
+                            if token_price and token_price.marketCap > current_remaining_value:
+                                token_detail['remainingValue'] = current_remaining_value
+                            else:
+                                token_detail['currentPrice'] = 0
+                                token_detail['remainingValue'] = 0
+                            token_detail['totalPnl'] = token_detail['realizedPnl'] + token_detail['remainingValue']
+                            remaining_value += token_detail['remainingValue']
                     
-                    # Sort and limit results
-                    wallets.sort(key=lambda x: x[sort_field], reverse=(sort_order == "desc"))
-                    wallets = wallets[:limit]
+                    wallet['remainingValue'] = remaining_value
+                    wallet['totalPnl'] = wallet['realizedPnl'] + remaining_value
+                
+                # Apply total PNL filter if specified
+                if minTotalPnl is not None and minTotalPnl > 0:
+                    wallets = [w for w in wallets if w['totalPnl'] >= minTotalPnl]
+                
+                # Sort and limit results
+                # Only the top `limit` wallets are returned, so select them without a full sort
+                select_top = heapq.nlargest if sort_order == "desc" else heapq.nsmallest
+                wallets = select_top(limit, wallets, key=itemgetter(sort_field))
                 
                 end_time = time.time()
                 execution_time = end_time - start_time
@@ -818,8 +921,8 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
                     },
                     'period': {
                         'days': days,
-                        'startDate': start_date.isoformat(),
-                        'endDate': end_date.isoformat()
+                        'startDate': start_date,
+                        'endDate': end_date
                     },
                     'metrics': {
                         'executionTimeSeconds': round(execution_time, 2),
@@ -850,6 +953,9 @@ class SmartMoneyPNLReportHandler(BaseSQLiteHandler):
         # Use cache manager for token investors report caching
         return cache_manager.get_report(cache_params, generate_token_report)
         
+# Doubles single quotes inside string literals
+_SQL_QUOTE_ESCAPES = str.maketrans({"'": "''"})
+
 def format_query(query, params):
     # Split the query by the placeholder '?'
     parts = query.split('?')
@@ -858,8 +964,8 @@ def format_query(query, params):
     if len(parts) - 1 != len(params):
         raise ValueError("Number of placeholders does not match number of parameters")
     
-    # Start with the first part of the query
-    formatted_query = parts[0]
+    # Collect the pieces and join once at the end instead of growing a string
+    formatted_parts = [parts[0]]
     
     # Iterate through parameters and corresponding query parts
     for i, param in enumerate(params):
@@ -868,11 +974,12 @@ def format_query(query, params):
             formatted_param = 'NULL'
         elif isinstance(param, str):
             # Handle strings: enclose in single quotes and escape existing quotes
-            formatted_param = "'" + param.replace("'", "''") + "'"
+            formatted_param = "'" + param.translate(_SQL_QUOTE_ESCAPES) + "'"
         else:
             # Handle numbers and other types by converting to string
             formatted_param = str(param)
         # Append the formatted parameter and the next part of the query
-        formatted_query += formatted_param + parts[i + 1]
+        formatted_parts.append(formatted_param)
+        formatted_parts.append(parts[i + 1])
     
-    return formatted_query
\ No newline at end of file
+    return ''.join(formatted_parts)
@@ -3,6 +3,7 @@ from database.operations.base_handler import BaseSQLiteHandler
 from logs.logger import get_logger
 import json
 import sqlite3
+from operator import itemgetter
 import requests
 from actions.DexscrennerAction import DexScreenerAction
 
@@ -227,7 +228,7 @@ class SmartMoneyWalletsReportHandler(BaseSQLiteHandler):
                     "profitandloss": "profitAndLoss"
                 }.get(sortBy)
                 
-                tokens = sorted(tokens, key=lambda x: x[sort_field_client], reverse=(sortOrder.lower() == "desc"))
+                tokens.sort(key=itemgetter(sort_field_client), reverse=(sortOrder.lower() == "desc"))
             
             # Return combined data
             return {
@@ -9,6 +9,49 @@ import time
 
 logger = get_logger(__name__)
 
+# Wallet-breakdown filter lookups: WALLET_BREAKDOWN_FIELDS[type index][category key] -> (count field, amount field)
+WALLET_CATEGORY_KEYS = {
+    "0-300K": "cat1",
+    "300K-1M": "cat2",
+    ">1M": "cat3"
+}
+WALLET_TYPE_INDEX = {
+    "no-selling": 0,  # No Selling
+    "<30%": 1,        # < 30%
+    ">30%": 2         # > 30%
+}
+WALLET_BREAKDOWN_FIELDS = tuple(
+    {
+        f"cat{n}": (f"pnl_category_{n}_{withdrawal}_count", f"pnl_category_{n}_{withdrawal}_total")
+        for n in (1, 2, 3)
+    }
+    for withdrawal in ("no_withdrawal", "partial_withdrawal", "significant_withdrawal")
+)
+ALL_WALLET_BREAKDOWN_FIELDS = [pair for fields in WALLET_BREAKDOWN_FIELDS for pair in fields.values()]
+
+def _splitFieldPairs(pairs) -> Tuple[List[str], List[str]]:
+    """[(count, amount), ...] -> ([counts...], [amounts...])"""
+    return [count for count, _ in pairs], [amount for _, amount in pairs]
+
+# Filter specializations keyed by (type index or None, category key or None):
+# both set -> that one cell, one set -> summed across the other, neither -> every cell
+WALLET_FILTER_FIELDS = {
+    **{
+        (type_idx, cat_key): _splitFieldPairs([WALLET_BREAKDOWN_FIELDS[type_idx][cat_key]])
+        for type_idx in WALLET_TYPE_INDEX.values()
+        for cat_key in WALLET_CATEGORY_KEYS.values()
+    },
+    **{
+        (None, cat_key): _splitFieldPairs([fields[cat_key] for fields in WALLET_BREAKDOWN_FIELDS])
+        for cat_key in WALLET_CATEGORY_KEYS.values()
+    },
+    **{
+        (type_idx, None): _splitFieldPairs(WALLET_BREAKDOWN_FIELDS[type_idx].values())
+        for type_idx in WALLET_TYPE_INDEX.values()
+    },
+    (None, None): _splitFieldPairs(ALL_WALLET_BREAKDOWN_FIELDS)
+}
+
 class SuperPortReportHandler(BaseSQLiteHandler):
     """
     Handler for combined report operations.
@@ -381,129 +424,30 @@ class SuperPortReportHandler(BaseSQLiteHandler):
         Returns:
             Filtered list of tokens
         """
-        filtered_tokens = []
-        
         # Skip filtering if no filters are set
         if not category and not type_filter and min_wallets <= 0 and min_amount <= 0:
             return tokens
-            
-        # Map category to the appropriate property access
-        category_map = {
-            "0-300K": "cat1",
-            "300K-1M": "cat2",
-            ">1M": "cat3"
-        }
         
-        # Map type to index in categoryData
-        type_map = {
-            "no-selling": 0,  # No Selling
-            "<30%": 1,        # < 30%
-            ">30%": 2         # > 30%
-        }
+        # Resolve once which fields are summed for every token; a missing or unknown
+        # category/type resolves to None, which selects the "sum across it" specialization
+        type_idx = WALLET_TYPE_INDEX.get(type_filter)
+        cat_key = WALLET_CATEGORY_KEYS.get(category)
+        if type_idx is None and cat_key is None and min_wallets <= 0 and min_amount <= 0:
+            return list(tokens)
+        count_fields, amount_fields = WALLET_FILTER_FIELDS[(type_idx, cat_key)]
         
-        cat_key = category_map.get(category)
-        type_idx = type_map.get(type_filter)
+        if not tokens:
+            return []
         
+        # Decimal sums and comparisons, so boundary values (e.g. 0.1 + 0.7 >= 0.8) hold exactly
+        min_amount_decimal = self._to_decimal(min_amount) if min_amount > 0 else None
+        filtered_tokens = []
         for token in tokens:
-            # Prepare wallet data structure for filtering
-            
-            # Prepare wallet data as in renderWalletCategories function
-            # Ensure all values are properly converted to numbers and handle None values
-            categoryData = [
-                {
-                    "name": "No Selling",
-                    "cat1": {
-                        "count": self._to_decimal(token.get("pnl_category_1_no_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_1_no_withdrawal_total", 0))
-                    },
-                    "cat2": {
-                        "count": self._to_decimal(token.get("pnl_category_2_no_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_2_no_withdrawal_total", 0))
-                    },
-                    "cat3": {
-                        "count": self._to_decimal(token.get("pnl_category_3_no_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_3_no_withdrawal_total", 0))
-                    }
-                },
-                {
-                    "name": "< 30%",
-                    "cat1": {
-                        "count": self._to_decimal(token.get("pnl_category_1_partial_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_1_partial_withdrawal_total", 0))
-                    },
-                    "cat2": {
-                        "count": self._to_decimal(token.get("pnl_category_2_partial_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_2_partial_withdrawal_total", 0))
-                    },
-                    "cat3": {
-                        "count": self._to_decimal(token.get("pnl_category_3_partial_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_3_partial_withdrawal_total", 0))
-                    }
-                },
-                {
-                    "name": "> 30%",
-                    "cat1": {
-                        "count": self._to_decimal(token.get("pnl_category_1_significant_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_1_significant_withdrawal_total", 0))
-                    },
-                    "cat2": {
-                        "count": self._to_decimal(token.get("pnl_category_2_significant_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_2_significant_withdrawal_total", 0))
-                    },
-                    "cat3": {
-                        "count": self._to_decimal(token.get("pnl_category_3_significant_withdrawal_count", 0)),
-                        "amount": self._to_decimal(token.get("pnl_category_3_significant_withdrawal_total", 0))
-                    }
-                }
-            ]
-            
-            # Apply filters
-            include_token = True
-            
-            # If both category and type are specified
-            if category and type_filter and type_idx is not None and cat_key:
-                wallet_count = categoryData[type_idx][cat_key]["count"]
-                wallet_amount = categoryData[type_idx][cat_key]["amount"]
-                
-                if wallet_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and wallet_amount < self._to_decimal(min_amount):
-                    include_token = False
-            
-            # If only category is specified
-            elif category and cat_key:
-                # Sum up wallets across all types for this category
-                total_count = sum(data[cat_key]["count"] for data in categoryData)
-                total_amount = sum(data[cat_key]["amount"] for data in categoryData)
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < self._to_decimal(min_amount):
-                    include_token = False
-            
-            # If only type is specified
-            elif type_filter and type_idx is not None:
-                # Sum up wallets across all categories for this type
-                total_count = sum(categoryData[type_idx][cat]["count"] for cat in ["cat1", "cat2", "cat3"])
-                total_amount = sum(categoryData[type_idx][cat]["amount"] for cat in ["cat1", "cat2", "cat3"])
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < self._to_decimal(min_amount):
-                    include_token = False
-            
-            # If only min_wallets or min_amount is specified
-            elif min_wallets > 0 or min_amount > 0:
-                # Sum up all wallets across all categories and types
-                total_count = sum(data[cat]["count"] for data in categoryData for cat in ["cat1", "cat2", "cat3"])
-                total_amount = sum(data[cat]["amount"] for data in categoryData for cat in ["cat1", "cat2", "cat3"])
-                
-                if total_count < min_wallets:
-                    include_token = False
-                if min_amount > 0 and total_amount < self._to_decimal(min_amount):
-                    include_token = False
-            
-            if include_token:
-                filtered_tokens.append(token)
-            
-        return filtered_tokens 
\ No newline at end of file
+            if sum(self._to_decimal(token.get(field)) for field in count_fields) < min_wallets:
+                continue
+            if (min_amount_decimal is not None
+                    and sum(self._to_decimal(token.get(field)) for field in amount_fields) < min_amount_decimal):
+                continue
+            filtered_tokens.append(token)
+        
+        return filtered_tokens
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.operations.connection_manager import DatabaseConnectionManager
+
+
+@pytest.fixture
+def conn_manager():
+    """A fresh in-memory DatabaseConnectionManager; the singleton is reset around each test"""
+    DatabaseConnectionManager._instance = None
+    manager = DatabaseConnectionManager(':memory:')
+    yield manager
+    manager.close_all()
+    DatabaseConnectionManager._instance = None
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from cache.cache_manager import CacheConfig, CacheManager
+
+
+@pytest.fixture
+def cache_manager():
+    CacheManager._instance = None
+    manager = CacheManager(CacheConfig(inflight_wait_timeout=2.0))
+    yield manager
+    CacheManager._instance = None
+
+
+def startLeader(cache_manager, tokens, leaderFetch):
+    """Run get_token_prices on another thread and return once its fetch is in flight"""
+    started = threading.Event()
+
+    def fetch(addresses):
+        started.set()
+        return leaderFetch(addresses)
+
+    leader = threading.Thread(target=lambda: cache_manager.get_token_prices(tokens, fetch))
+    leader.start()
+    assert started.wait(2)
+    return leader
+
+
+def test_waiter_fetches_tokens_when_leader_fails(cache_manager, caplog):
+    release = threading.Event()
+
+    def failingFetch(addresses):
+        release.wait(2)
+        raise RuntimeError('DexScreener unavailable')
+
+    leader = startLeader(cache_manager, ['tokenA', 'tokenB'], failingFetch)
+    waiterCalls = []
+
+    def waiterFetch(addresses):
+        waiterCalls.append(list(addresses))
+        return {address: f'price-{address}' for address in addresses}
+
+    threading.Timer(0.2, release.set).start()
+    with caplog.at_level(logging.WARNING, logger='cache.cache_manager'):
+        prices = cache_manager.get_token_prices(['tokenA', 'tokenB'], waiterFetch)
+    leader.join(2)
+
+    assert prices == {'tokenA': 'price-tokenA', 'tokenB': 'price-tokenB'}
+    assert waiterCalls == [['tokenA', 'tokenB']]
+    assert 'not delivered by in-flight fetches' in caplog.text
+
+
+def test_waiter_shares_leader_result(cache_manager):
+    release = threading.Event()
+
+    def slowFetch(addresses):
+        release.wait(2)
+        return {address: f'price-{address}' for address in addresses}
+
+    leader = startLeader(cache_manager, ['tokenA'], slowFetch)
+    waiterCalls = []
+
+    def waiterFetch(addresses):
+        waiterCalls.append(list(addresses))
+        return {address: f'own-{address}' for address in addresses}
+
+    threading.Timer(0.2, release.set).start()
+    prices = cache_manager.get_token_prices(['tokenA', 'tokenB'], waiterFetch)
+    leader.join(2)
+
+    assert prices == {'tokenA': 'price-tokenA', 'tokenB': 'own-tokenB'}
+    assert waiterCalls == [['tokenB']]
+
+
+def test_waiter_stops_waiting_on_stuck_leader(cache_manager):
+    cache_manager.config.inflight_wait_timeout = 0.2
+    release = threading.Event()
+
+    def stuckFetch(addresses):
+        release.wait(5)
+        return {}
+
+    leader = startLeader(cache_manager, ['tokenA'], stuckFetch)
+    try:
+        startedAt = time.time()
+        prices = cache_manager.get_token_prices(['tokenA'], lambda addresses: {'tokenA': 'own'})
+        assert prices == {'tokenA': 'own'}
+        assert time.time() - startedAt < 2
+    finally:
+        release.set()
+        leader.join(2)
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from database.operations.schema import PortfolioSummary
+from database.portsummary.PortfolioHandler import PortfolioHandler
+
+# portsummary as it was before idx_portsummary_tokenid existed
+LEGACY_PORTSUMMARY_DDL = '''
+    CREATE TABLE portsummary (
+        portsummaryid INTEGER PRIMARY KEY AUTOINCREMENT,
+        chainname TEXT NOT NULL,
+        tokenid TEXT NOT NULL,
+        name TEXT NOT NULL,
+        tokenage TEXT NOT NULL,
+        mcap DECIMAL NOT NULL,
+        currentprice DECIMAL NOT NULL,
+        avgprice DECIMAL NOT NULL,
+        smartbalance DECIMAL NOT NULL,
+        walletsinvesting1000 INTEGER NOT NULL,
+        walletsinvesting5000 INTEGER NOT NULL,
+        walletsinvesting10000 INTEGER NOT NULL,
+        qtychange1d DECIMAL NOT NULL,
+        qtychange7d DECIMAL NOT NULL,
+        qtychange30d DECIMAL NOT NULL,
+        status INTEGER DEFAULT 1,
+        firstseen TIMESTAMP NOT NULL,
+        lastseen TIMESTAMP NOT NULL,
+        createdat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updatedat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tags TEXT,
+        markedinactive TIMESTAMP
+    )
+'''
+
+LEGACY_INSERT_SQL = '''
+    INSERT INTO portsummary (chainname, tokenid, name, tokenage, mcap, currentprice, avgprice,
+        smartbalance, walletsinvesting1000, walletsinvesting5000, walletsinvesting10000,
+        qtychange1d, qtychange7d, qtychange30d, firstseen, lastseen, tags)
+    VALUES ('sol', ?, ?, '1d', 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, '2024-01-01 00:00:00', '2024-01-02 00:00:00', ?)
+'''
+
+
+def makeSummary(tokenId, name):
+    return PortfolioSummary(
+        chainname='sol', tokenid=tokenId, name=name, tokenage='1d',
+        mcap=Decimal('100'), currentprice=Decimal('1'), avgprice=Decimal('1'),
+        smartbalance=Decimal('10'), walletsinvesting1000=1, walletsinvesting5000=0,
+        walletsinvesting10000=0, qtychange1d=Decimal('0'), qtychange7d=Decimal('0'),
+        qtychange30d=Decimal('0'), tags=['fresh']
+    )
+
+
+def seedLegacyTable(conn_manager, rows):
+    with conn_manager.transaction() as cursor:
+        cursor.execute(LEGACY_PORTSUMMARY_DDL)
+        cursor.executemany(LEGACY_INSERT_SQL, rows)
+
+
+def test_duplicate_tokenids_are_archived_before_unique_index(conn_manager):
+    seedLegacyTable(conn_manager, [
+        ('tokenA', 'A-oldest', ' x , y,,z '),
+        ('tokenA', 'A-older', '[]'),
+        ('tokenB', 'B-only', None),
+        ('tokenA', 'A-newest', 'w'),
+    ])
+
+    PortfolioHandler(conn_manager)
+
+    with conn_manager.transaction() as cursor:
+        cursor.execute('SELECT portsummaryid, tokenid, name FROM portsummary ORDER BY portsummaryid')
+        assert [tuple(row) for row in cursor.fetchall()] == [(3, 'tokenB', 'B-only'), (4, 'tokenA', 'A-newest')]
+        cursor.execute('SELECT portsummaryid, tokenid, name, tags FROM portsummaryhistory ORDER BY historyid')
+        assert [tuple(row) for row in cursor.fetchall()] == [
+            (4, 'tokenA', 'A-oldest', '["x","y","z"]'),
+            (4, 'tokenA', 'A-older', '[]'),
+        ]
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'idx_portsummary_tokenid'")
+        assert 'UNIQUE' in cursor.fetchone()[0]
+
+
+def test_handler_startup_is_idempotent(conn_manager):
+    seedLegacyTable(conn_manager, [('tokenA', 'A-old', None), ('tokenA', 'A-new', None)])
+    PortfolioHandler(conn_manager)
+    PortfolioHandler(conn_manager)
+
+    with conn_manager.transaction() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM portsummaryhistory')
+        assert cursor.fetchone()[0] == 1
+
+
+def test_persist_upserts_on_tokenid(conn_manager):
+    seedLegacyTable(conn_manager, [('tokenA', 'A-old', None), ('tokenA', 'A-new', None)])
+    handler = PortfolioHandler(conn_manager)
+
+    stats = handler.persistPortfolioSummaryData([makeSummary('tokenA', 'A-updated'), makeSummary('tokenC', 'C')], [])
+
+    assert stats == {'updated': 1, 'inserted': 1}
+    with conn_manager.transaction() as cursor:
+        cursor.execute('SELECT portsummaryid, tokenid, name, firstseen, tags FROM portsummary ORDER BY portsummaryid')
+        rows = [tuple(row) for row in cursor.fetchall()]
+        assert rows[0] == (2, 'tokenA', 'A-updated', '2024-01-01 00:00:00', '["fresh"]')
+        assert [row[1:3] for row in rows[1:]] == [('tokenC', 'C')]
+        cursor.execute("SELECT name FROM portsummaryhistory WHERE tokenid = 'tokenA' ORDER BY historyid")
+        assert [row[0] for row in cursor.fetchall()] == ['A-old', 'A-new']
@@ -0,0 +1,26 @@
+from database.superport.SuperPortReportHandler import SuperPortReportHandler
+
+
+def test_min_amount_boundary_is_exact():
+    handler = SuperPortReportHandler(conn_manager=None)
+    token = {
+        'pnl_category_1_no_withdrawal_count': 1,
+        'pnl_category_1_no_withdrawal_total': 0.1,
+        'pnl_category_2_no_withdrawal_count': 1,
+        'pnl_category_2_no_withdrawal_total': 0.7,
+    }
+
+    # 0.1 + 0.7 is 0.7999999999999999 in float arithmetic
+    assert handler.filterTokensByWalletBreakdown([token], type_filter='no-selling', min_amount=0.8) == [token]
+    assert handler.filterTokensByWalletBreakdown([token], type_filter='no-selling', min_amount=0.81) == []
+
+
+def test_min_wallets_sums_across_categories():
+    handler = SuperPortReportHandler(conn_manager=None)
+    token = {
+        'pnl_category_1_partial_withdrawal_count': 2,
+        'pnl_category_3_significant_withdrawal_count': '1',
+    }
+
+    assert handler.filterTokensByWalletBreakdown([token], min_wallets=3) == [token]
+    assert handler.filterTokensByWalletBreakdown([token], min_wallets=4) == []
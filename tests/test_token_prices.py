@@ -0,0 +1,64 @@
+from actions.DexscrennerAction import TokenPrice
+from cache.cache_manager import SimpleTTLCache
+from database.smartmoneymovements.SmartMoneyMovementsReportHandler import (
+    PRICE_CHAIN,
+    PRICE_CHUNK_SIZE,
+    SmartMoneyMovementsReportHandler,
+)
+
+
+class StubDexScreener:
+    """Prices every token at 1.5 except those in a failing chunk, which come back as None"""
+
+    def __init__(self, failingTokens=()):
+        self.failingTokens = set(failingTokens)
+        self.calls = []
+
+    def getBatchTokenPrices(self, tokenAddresses, chainId="solana", **kwargs):
+        self.calls.append(list(tokenAddresses))
+        if self.failingTokens.intersection(tokenAddresses):
+            return dict.fromkeys(tokenAddresses)
+        return {token: TokenPrice(price=1.5, fdv=0, marketCap=0, name=token, symbol=token) for token in tokenAddresses}
+
+
+def makeHandler(conn_manager, monkeypatch, dexScreener):
+    monkeypatch.setattr(SmartMoneyMovementsReportHandler, '_tablesReady', False)
+    monkeypatch.setattr(SmartMoneyMovementsReportHandler, '_price_cache', SimpleTTLCache(maxsize=100, ttl=60))
+    handler = SmartMoneyMovementsReportHandler(conn_manager)
+    handler.dex_screener = dexScreener
+    return handler
+
+
+def storedPrices(conn_manager):
+    with conn_manager.transaction() as cursor:
+        cursor.execute('SELECT tokenaddress, price FROM token_prices_cache')
+        return dict(cursor.fetchall())
+
+
+def test_failed_chunk_returns_zero_without_caching(conn_manager, monkeypatch):
+    tokens = [f'token{i}' for i in range(PRICE_CHUNK_SIZE + 5)]
+    failedChunk = tokens[:PRICE_CHUNK_SIZE]
+    handler = makeHandler(conn_manager, monkeypatch, StubDexScreener(failingTokens=failedChunk[:1]))
+
+    prices = handler._fetchTokenPrices(tokens)
+
+    assert prices == {**dict.fromkeys(failedChunk, 0), **dict.fromkeys(tokens[PRICE_CHUNK_SIZE:], 1.5)}
+    assert storedPrices(conn_manager) == dict.fromkeys(tokens[PRICE_CHUNK_SIZE:], 1.5)
+    for token in failedChunk:
+        assert handler._price_cache.get((PRICE_CHAIN, token)) is None
+
+
+def test_failed_chunk_is_refetched_on_next_call(conn_manager, monkeypatch):
+    tokens = ['tokenA', 'tokenB']
+    dexScreener = StubDexScreener(failingTokens=tokens)
+    handler = makeHandler(conn_manager, monkeypatch, dexScreener)
+    assert handler._fetchTokenPrices(tokens) == dict.fromkeys(tokens, 0)
+
+    dexScreener.failingTokens.clear()
+    assert handler._fetchTokenPrices(tokens) == dict.fromkeys(tokens, 1.5)
+    assert dexScreener.calls == [tokens, tokens]
+    assert storedPrices(conn_manager) == dict.fromkeys(tokens, 1.5)
+
+    # Now served from the process cache without another lookup
+    assert handler._fetchTokenPrices(tokens) == dict.fromkeys(tokens, 1.5)
+    assert len(dexScreener.calls) == 2